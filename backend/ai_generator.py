@@ -1,274 +1,582 @@
-import anthropic
-from typing import List, Optional, Dict, Any
-
-class AIGenerator:
-    """Handles interactions with Anthropic's Claude API for generating responses"""
-    
-    # Static system prompt to avoid rebuilding on each call
-    SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to comprehensive search and outline tools for course information.
-
-Available Tools:
-1. **search_course_content**: For questions about specific course content or detailed educational materials
-2. **get_course_outline**: For questions about course outlines, structure, lesson lists, or complete course overviews
-
-Tool Usage Guidelines:
-- **Course outline questions** (e.g., "What is the outline of...", "What lessons are in...", "Show me the structure of..."): Use get_course_outline
-- **Course content questions**: Use search_course_content for specific content within courses
-- **Sequential tool use**: You may use multiple tools to gather comprehensive information
-  - For comparisons: Search multiple courses/lessons separately
-  - For complex questions: Break down into multiple searches  
-  - For comprehensive answers: Combine outline and content searches
-- **Maximum 2 rounds of tool calls per user query**
-- Synthesize tool results into accurate, fact-based responses
-- If tool yields no results, state this clearly without offering alternatives
-
-Sequential Reasoning:
-- After each tool use, evaluate if you need additional information
-- Use follow-up searches to gather complete context before responding
-- Combine information from multiple searches for comprehensive answers
-- Example flow: get_course_outline → search_course_content → provide complete answer
-
-Course Outline Responses:
-When using get_course_outline, always include:
-- Course title
-- Course link (if available)
-- Complete lesson list with lesson numbers and titles
-- Present information exactly as returned by the tool
-
-Response Protocol:
-- **General knowledge questions**: Answer using existing knowledge without using tools
-- **Course outline questions**: Use get_course_outline first, then answer
-- **Course-specific content questions**: Use search_course_content first, then answer
-- **Complex questions**: Use multiple tools as needed to gather complete information
-- **No meta-commentary**:
- - Provide direct answers only — no reasoning process, tool explanations, or question-type analysis
- - Do not mention "based on the tool results"
-
-All responses must be:
-1. **Brief, Concise and focused** - Get to the point quickly
-2. **Educational** - Maintain instructional value
-3. **Clear** - Use accessible language
-4. **Example-supported** - Include relevant examples when they aid understanding
-Provide only the direct answer to what was asked.
-"""
-    
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
-        self.model = model
-        
-        # Pre-build base API parameters
-        self.base_params = {
-            "model": self.model,
-            "temperature": 0,
-            "max_tokens": 800
-        }
-    
-    def generate_response(self, query: str,
-                         conversation_history: Optional[str] = None,
-                         tools: Optional[List] = None,
-                         tool_manager=None,
-                         max_rounds: int = 2) -> str:
-        """
-        Generate AI response with support for sequential tool calling.
-        
-        Args:
-            query: The user's question or request
-            conversation_history: Previous messages for context
-            tools: Available tools the AI can use
-            tool_manager: Manager to execute tools
-            max_rounds: Maximum number of tool calling rounds (default: 2)
-            
-        Returns:
-            Generated response as string
-        """
-        
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history 
-            else self.SYSTEM_PROMPT
-        )
-        
-        # Prepare initial messages
-        initial_messages = [{"role": "user", "content": query}]
-        
-        # Handle sequential tool calling if tools are available
-        if tools and tool_manager:
-            return self._handle_sequential_tool_calls(
-                initial_messages, system_content, tools, tool_manager, max_rounds
-            )
-        
-        # Handle regular response without tools
-        api_params = {
-            **self.base_params,
-            "messages": initial_messages,
-            "system": system_content
-        }
-        
-        response = self.client.messages.create(**api_params)
-        return response.content[0].text
-    
-    def _handle_sequential_tool_calls(self, initial_messages: List, system_content: str, 
-                                     tools: List, tool_manager, max_rounds: int) -> str:
-        """
-        Handle multiple rounds of tool calling with conversation context preservation.
-        
-        Args:
-            initial_messages: Starting conversation messages
-            system_content: System prompt content
-            tools: Available tools for AI
-            tool_manager: Tool execution manager
-            max_rounds: Maximum rounds allowed
-            
-        Returns:
-            Final response after all tool calling rounds
-        """
-        messages = initial_messages.copy()
-        round_count = 0
-        
-        while round_count < max_rounds:
-            # Prepare API call with tools
-            api_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": system_content,
-                "tools": tools,
-                "tool_choice": {"type": "auto"}
-            }
-            
-            try:
-                # Get Claude's response
-                response = self.client.messages.create(**api_params)
-                
-                # Add Claude's response to conversation
-                messages.append({"role": "assistant", "content": response.content})
-                
-                # Check if Claude wants to use tools
-                if response.stop_reason == "tool_use":
-                    # Execute tools and add results
-                    tool_results = self._execute_tools(response, tool_manager)
-                    if tool_results:
-                        messages.append({"role": "user", "content": tool_results})
-                        round_count += 1
-                        continue
-                    else:
-                        # Tool execution failed, break the loop
-                        break
-                else:
-                    # No more tool use, return final response
-                    return response.content[0].text
-                    
-            except Exception as e:
-                # Handle API errors gracefully
-                return f"Error during tool calling: {str(e)}"
-        
-        # If we've reached max rounds, make final call without tools
-        return self._make_final_call(messages, system_content)
-    
-    def _execute_tools(self, response, tool_manager) -> Optional[List]:
-        """
-        Execute all tool calls from Claude's response.
-        
-        Args:
-            response: Claude's response containing tool calls
-            tool_manager: Tool execution manager
-            
-        Returns:
-            List of tool results or None if execution fails
-        """
-        tool_results = []
-        
-        for content_block in response.content:
-            if content_block.type == "tool_use":
-                try:
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name, 
-                        **content_block.input
-                    )
-                    
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": tool_result
-                    })
-                except Exception as e:
-                    # Log tool execution error and continue
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": f"Error executing tool: {str(e)}"
-                    })
-        
-        return tool_results if tool_results else None
-    
-    def _make_final_call(self, messages: List, system_content: str) -> str:
-        """
-        Make final API call without tools to get Claude's final response.
-        
-        Args:
-            messages: Complete conversation history
-            system_content: System prompt content
-            
-        Returns:
-            Final response text
-        """
-        final_params = {
-            **self.base_params,
-            "messages": messages,
-            "system": system_content
-            # Intentionally no tools for final response
-        }
-        
-        try:
-            final_response = self.client.messages.create(**final_params)
-            return final_response.content[0].text
-        except Exception as e:
-            return f"Error generating final response: {str(e)}"
-    
-    def _handle_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager):
-        """
-        Handle execution of tool calls and get follow-up response.
-        
-        Args:
-            initial_response: The response containing tool use requests
-            base_params: Base API parameters
-            tool_manager: Manager to execute tools
-            
-        Returns:
-            Final response text after tool execution
-        """
-        # Start with existing messages
-        messages = base_params["messages"].copy()
-        
-        # Add AI's tool use response
-        messages.append({"role": "assistant", "content": initial_response.content})
-        
-        # Execute all tool calls and collect results
-        tool_results = []
-        for content_block in initial_response.content:
-            if content_block.type == "tool_use":
-                tool_result = tool_manager.execute_tool(
-                    content_block.name, 
-                    **content_block.input
-                )
-                
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": content_block.id,
-                    "content": tool_result
-                })
-        
-        # Add tool results as single message
-        if tool_results:
-            messages.append({"role": "user", "content": tool_results})
-        
-        # Prepare final API call without tools
-        final_params = {
-            **self.base_params,
-            "messages": messages,
-            "system": base_params["system"]
-        }
-        
-        # Get final response
-        final_response = self.client.messages.create(**final_params)
-        return final_response.content[0].text
\ No newline at end of file
+import hashlib
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any
+
+# The anthropic SDK (and httpx/pydantic behind it) dominate this module's
+# import time; defer them until a client is actually built so test workers
+# and app startup pay nothing at import.
+_anthropic = None
+
+
+def _load_anthropic():
+    """Import and cache the anthropic SDK on first use"""
+    global _anthropic
+    if _anthropic is None:
+        import anthropic as _sdk
+        _anthropic = _sdk
+    return _anthropic
+
+
+def __getattr__(name):
+    # Keep `ai_generator.anthropic` resolvable (tests patch
+    # ai_generator.anthropic.Anthropic) despite the lazy import
+    if name == "anthropic":
+        return _load_anthropic()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class AIGenerator:
+    """Handles interactions with Anthropic's Claude API for generating responses"""
+    
+    # Static system prompt to avoid rebuilding on each call
+    SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to comprehensive search and outline tools for course information.
+
+Available Tools:
+1. **search_course_content**: For questions about specific course content or detailed educational materials
+2. **get_course_outline**: For questions about course outlines, structure, lesson lists, or complete course overviews
+
+Tool Usage Guidelines:
+- **Course outline questions** (e.g., "What is the outline of...", "What lessons are in...", "Show me the structure of..."): Use get_course_outline
+- **Course content questions**: Use search_course_content for specific content within courses
+- **Sequential tool use**: You may use multiple tools to gather comprehensive information
+  - For comparisons: Search multiple courses/lessons separately
+  - For complex questions: Break down into multiple searches  
+  - For comprehensive answers: Combine outline and content searches
+- **Maximum 2 rounds of tool calls per user query**
+- When you need multiple independent lookups, call `batch_tool` once with all invocations instead of calling tools one by one
+- Synthesize tool results into accurate, fact-based responses
+- If tool yields no results, state this clearly without offering alternatives
+
+Sequential Reasoning:
+- After each tool use, evaluate if you need additional information
+- Use follow-up searches to gather complete context before responding
+- Combine information from multiple searches for comprehensive answers
+- Example flow: get_course_outline → search_course_content → provide complete answer
+
+Course Outline Responses:
+When using get_course_outline, always include:
+- Course title
+- Course link (if available)
+- Complete lesson list with lesson numbers and titles
+- Present information exactly as returned by the tool
+
+Response Protocol:
+- **General knowledge questions**: Answer using existing knowledge without using tools
+- **Course outline questions**: Use get_course_outline first, then answer
+- **Course-specific content questions**: Use search_course_content first, then answer
+- **Complex questions**: Use multiple tools as needed to gather complete information
+- **No meta-commentary**:
+ - Provide direct answers only — no reasoning process, tool explanations, or question-type analysis
+ - Do not mention "based on the tool results"
+
+All responses must be:
+1. **Brief, Concise and focused** - Get to the point quickly
+2. **Educational** - Maintain instructional value
+3. **Clear** - Use accessible language
+4. **Example-supported** - Include relevant examples when they aid understanding
+Provide only the direct answer to what was asked.
+"""
+
+    # Prebuilt cache-marked block for the static prompt so it isn't
+    # reconstructed on every call and stays byte-stable for prompt caching
+    SYSTEM_PROMPT_BLOCK = {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"}
+    }
+
+    # One Anthropic client per process so every request reuses the same
+    # keep-alive connection pool instead of paying a TLS handshake per call
+    _shared_client = None
+
+    def __init__(self, api_key: str, model: str, cache_enabled: bool = True):
+        self.api_key = api_key
+        self.model = model
+
+        # Pre-build base API parameters
+        self.base_params = {
+            "model": self.model,
+            "temperature": 0,
+            "max_tokens": 800,
+            "extra_headers": {"anthropic-beta": "prompt-caching-2024-07-31"}
+        }
+
+        # Shared executor for running independent tool calls concurrently
+        self._executor = ThreadPoolExecutor(max_workers=8)
+
+        # Budget for conversation history included in the system prompt;
+        # older turns are dropped so input size stays bounded as chats grow
+        self.max_history_tokens = 4000
+
+        # Response cache: with temperature=0 the synthesized text is
+        # deterministic for identical inputs, so repeated queries can skip
+        # the API round-trip entirely. Bounded by RESPONSE_CACHE_MAX so a
+        # long-lived process never grows it without limit.
+        self.cache_enabled = cache_enabled
+        self._response_cache: Dict[str, str] = {}
+        # Prepared tool schemas, keyed by tool names; the definitions are
+        # stable across requests so the batch injection and cache marking
+        # (and the SDK's serialization-friendly structure) happen once
+        self._prepared_tools: Dict[tuple, List] = {}
+
+    @property
+    def client(self):
+        """
+        Lazily build the shared Anthropic client on first use.
+
+        Constructing the generator no longer touches the SDK, so startup and
+        test collection pay nothing until a request actually goes out.
+        """
+        if AIGenerator._shared_client is None:
+            import httpx
+            AIGenerator._shared_client = _load_anthropic().Anthropic(
+                api_key=self.api_key,
+                http_client=httpx.Client(
+                    # HTTP/2 multiplexes the sequential tool rounds on one
+                    # connection and compresses the repeated headers
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=20,
+                        max_connections=40,
+                        keepalive_expiry=60.0
+                    ),
+                    # The read timeout is the stream dead-man: httpx applies
+                    # it per socket read, so a stalled stream fails after
+                    # STREAM_STALL_TIMEOUT instead of blocking on a dead
+                    # connection. Write/pool keep the generous default.
+                    timeout=httpx.Timeout(
+                        600.0, connect=10.0,
+                        read=self.STREAM_STALL_TIMEOUT
+                    )
+                )
+            )
+        return AIGenerator._shared_client
+
+    # Pseudo-tool that wraps several independent invocations in one tool_use
+    # block, so Claude can fan out lookups without burning extra rounds
+    BATCH_TOOL_DEFINITION = {
+        "name": "batch_tool",
+        "description": "Run multiple independent tool invocations in parallel and get all results in one response",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "invocations": {
+                    "type": "array",
+                    "description": "Tool invocations to run in parallel",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {
+                                "type": "string",
+                                "description": "Name of the tool to invoke"
+                            },
+                            "arguments": {
+                                "type": "object",
+                                "description": "Arguments to pass to the tool"
+                            }
+                        },
+                        "required": ["name", "arguments"]
+                    }
+                }
+            },
+            "required": ["invocations"]
+        }
+    }
+
+    def _inject_batch_tool(self, tools: List) -> List:
+        """Return the tool list with the batch_tool pseudo-tool appended"""
+        return [*tools, self.BATCH_TOOL_DEFINITION]
+
+    def _prepare_tools(self, tools: List) -> List:
+        """
+        Return the tool list ready to send: batch pseudo-tool appended and the
+        last definition cache-marked so the schema prefix hits Anthropic's
+        prompt cache. The result is memoized per tool-name set, since the
+        schemas are stable and rebuilding (and re-serializing) them on every
+        call is pure overhead.
+        """
+        key = tuple(tool["name"] for tool in tools)
+        prepared = self._prepared_tools.get(key)
+        if prepared is None:
+            prepared = self._inject_batch_tool(tools)
+            prepared = [*prepared[:-1], {**prepared[-1], "cache_control": {"type": "ephemeral"}}]
+            self._prepared_tools[key] = prepared
+        return prepared
+
+    # Local routing patterns: queries that obviously name a tool's job skip
+    # Claude's routing decision by forcing tool_choice on the first round.
+    # "What is X?" style queries are left to Claude — in this domain they are
+    # often content questions (e.g. "What is MCP?"), not general knowledge.
+    _OUTLINE_QUERY = re.compile(
+        r"\b(outline|structure) of\b|\bwhat lessons\b|\blessons? (are )?in\b",
+        re.IGNORECASE
+    )
+    _CONTENT_QUERY = re.compile(r"\blesson \d+ of\b", re.IGNORECASE)
+
+    @classmethod
+    def _classify_query(cls, query: str) -> Optional[str]:
+        """Return the tool name an obvious query should route to, or None"""
+        if cls._OUTLINE_QUERY.search(query):
+            return "get_course_outline"
+        if cls._CONTENT_QUERY.search(query):
+            return "search_course_content"
+        return None
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Cheap token estimate (roughly 4 characters per token)"""
+        return len(text) // 4
+
+    # A turn starts at a line labeled with its role; message bodies can
+    # themselves contain newlines, so a bare "\n" is not a turn boundary
+    _TURN_BOUNDARY = re.compile(r"\n(?=(?:User|Assistant): )")
+
+    def _truncate_history(self, history: str) -> str:
+        """
+        Drop the oldest turns from a formatted history string until it fits
+        the token budget, preserving the most recent context.
+
+        Args:
+            history: Formatted conversation history as produced by
+                SessionManager -- turns labeled "User: "/"Assistant: ",
+                with bodies that may span multiple lines
+
+        Returns:
+            History string within the token budget; whole turns are
+            dropped (never sliced mid-message), and the newest turn is
+            always kept
+        """
+        if self._estimate_tokens(history) <= self.max_history_tokens:
+            return history
+
+        turns = self._TURN_BOUNDARY.split(history)
+        remaining = len(history)
+        while len(turns) > 1 and remaining // 4 > self.max_history_tokens:
+            remaining -= len(turns.pop(0)) + 1  # +1 for the dropped newline
+
+        return "\n".join(turns)
+
+    @staticmethod
+    def _cache_key(*parts) -> str:
+        """Build a stable cache key from JSON-serializable (or str-able) parts"""
+        serialized = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    @staticmethod
+    def _stable_flow_parts(messages: List) -> List:
+        """
+        Reduce a tool-flow message list to the content that is stable across
+        replays: roles, text, tool names and inputs, and tool result texts.
+
+        Server-generated tool_use ids are unique per API response, so keying
+        on the raw messages would give the cache a guaranteed 0% hit rate;
+        the ids are dropped here so identical flows produce identical keys.
+        """
+        parts = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                parts.append((message["role"], content))
+                continue
+            for block in content:
+                if isinstance(block, dict):
+                    # Locally built tool_result dicts
+                    if block.get("type") == "tool_result":
+                        parts.append(("tool_result", block.get("content")))
+                    else:
+                        parts.append((block.get("type"), block.get("text")))
+                else:
+                    # SDK content blocks from the assistant response
+                    block_type = getattr(block, "type", None)
+                    if block_type == "tool_use":
+                        parts.append(("tool_use", block.name, block.input))
+                    elif block_type == "text":
+                        parts.append(("text", block.text))
+        return parts
+
+    # Cap on cached responses; the oldest entry is evicted at capacity
+    RESPONSE_CACHE_MAX = 1024
+
+    def _cache_store(self, key: str, value: str) -> None:
+        """Insert into the response cache, evicting the oldest entry at capacity"""
+        if len(self._response_cache) >= self.RESPONSE_CACHE_MAX:
+            self._response_cache.pop(next(iter(self._response_cache)))
+        self._response_cache[key] = value
+
+    # Seconds without data on the stream socket before the request is
+    # failed; enforced as the shared client's per-read timeout
+    STREAM_STALL_TIMEOUT = 30.0
+
+    # Attempts for transient API failures (rate limits, dropped connections)
+    MAX_API_ATTEMPTS = 3
+
+    def _stream_message(self, api_params: Dict[str, Any]):
+        """
+        Stream an API response and return the final Message object.
+
+        Streaming breaks the response into many small socket reads, so the
+        client's per-read timeout (STREAM_STALL_TIMEOUT) fails a stalled
+        connection quickly; the SDK surfaces that as an APITimeoutError,
+        which the APIConnectionError clause below retries like any other
+        dropped connection. Other errors propagate to the caller.
+
+        Args:
+            api_params: Complete parameters for the messages API call
+
+        Returns:
+            The final Message object (with stop_reason and content blocks)
+        """
+        sdk = _load_anthropic()
+        for attempt in range(self.MAX_API_ATTEMPTS):
+            try:
+                with self.client.messages.stream(**api_params) as stream:
+                    # Drain the stream; the per-read timeout on the shared
+                    # client bounds each wait for the next chunk. The text
+                    # is discarded here, so retrying below after a partial
+                    # stream is safe -- if chunks are ever forwarded to
+                    # clients, retries must not replay already-sent text.
+                    for _ in stream.text_stream:
+                        pass
+                    return stream.get_final_message()
+            except (sdk.RateLimitError, sdk.APIConnectionError):
+                if attempt == self.MAX_API_ATTEMPTS - 1:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+    
+    def generate_response(self, query: str,
+                         conversation_history: Optional[str] = None,
+                         tools: Optional[List] = None,
+                         tool_manager=None,
+                         max_rounds: int = 2) -> str:
+        """
+        Generate AI response with support for sequential tool calling.
+        
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            max_rounds: Maximum number of tool calling rounds (default: 2)
+            
+        Returns:
+            Generated response as string
+        """
+        
+        # Static prompt block first (byte-stable cache prefix); the varying
+        # conversation history must come after it
+        system_content = [self.SYSTEM_PROMPT_BLOCK]
+        if conversation_history:
+            conversation_history = self._truncate_history(conversation_history)
+            system_content.append({
+                "type": "text",
+                "text": f"Previous conversation:\n{conversation_history}"
+            })
+        
+        # Prepare initial messages
+        initial_messages = [{"role": "user", "content": query}]
+        
+        # Handle sequential tool calling if tools are available
+        if tools and tool_manager:
+            return self._handle_sequential_tool_calls(
+                initial_messages, system_content, tools, tool_manager, max_rounds,
+                forced_tool=self._classify_query(query)
+            )
+        
+        # Handle regular response without tools
+        api_params = {
+            **self.base_params,
+            "messages": initial_messages,
+            "system": system_content
+        }
+
+        cache_key = None
+        if self.cache_enabled:
+            cache_key = self._cache_key(query, conversation_history)
+            if cache_key in self._response_cache:
+                return self._response_cache[cache_key]
+
+        response = self._stream_message(api_params)
+        result = response.content[0].text
+
+        if cache_key is not None:
+            self._cache_store(cache_key, result)
+        return result
+    
+    def _handle_sequential_tool_calls(self, initial_messages: List, system_content: List,
+                                     tools: List, tool_manager, max_rounds: int,
+                                     forced_tool: Optional[str] = None) -> str:
+        """
+        Handle multiple rounds of tool calling with conversation context preservation.
+
+        Args:
+            initial_messages: Starting conversation messages
+            system_content: System prompt content
+            tools: Available tools for AI
+            tool_manager: Tool execution manager
+            max_rounds: Maximum rounds allowed
+            forced_tool: Tool name to force on the first round (local routing)
+
+        Returns:
+            Final response after all tool calling rounds
+        """
+        messages = list(initial_messages)
+        round_count = 0
+        response = None
+
+        # Batch pseudo-tool plus cache marker, memoized across calls
+        tools = self._prepare_tools(tools)
+
+        # Only messages changes between rounds, so build the params once
+        api_params = {
+            **self.base_params,
+            "system": system_content,
+            "tools": tools,
+            "tool_choice": {"type": "auto"}
+        }
+        if forced_tool and any(tool["name"] == forced_tool for tool in tools):
+            # Route the first round straight to the locally classified tool.
+            # Only when it is actually offered: the API rejects a
+            # tool_choice naming a tool absent from the definitions.
+            api_params["tool_choice"] = {"type": "tool", "name": forced_tool}
+
+        while round_count < max_rounds:
+            # Snapshot the list so later appends don't alias into this call
+            api_params["messages"] = list(messages)
+
+            # Get Claude's response; API errors propagate to the caller
+            # rather than being flattened into success-shaped strings
+            response = self._stream_message(api_params)
+
+            # Forcing only applies to the first round
+            api_params["tool_choice"] = {"type": "auto"}
+
+            # Add Claude's response to conversation
+            messages.append({"role": "assistant", "content": response.content})
+
+            # Check if Claude wants to use tools
+            if response.stop_reason == "tool_use":
+                # Execute tools and add results
+                tool_results = self._execute_tools(response, tool_manager)
+                if tool_results:
+                    messages.append({"role": "user", "content": tool_results})
+                    round_count += 1
+                    continue
+                else:
+                    # Tool execution failed, break the loop
+                    break
+            else:
+                # No more tool use, return final response
+                return response.content[0].text
+
+        # Claude often produces partial text alongside its tool_use blocks;
+        # if the last response already has usable text, skip the extra call
+        if response is not None:
+            text = "".join(
+                block.text for block in response.content
+                if getattr(block, "type", None) == "text" and block.text
+            )
+            if text:
+                return text
+
+        # Otherwise make a final call without tools to synthesize an answer
+        return self._make_final_call(messages, system_content)
+    
+    def _execute_tools(self, response, tool_manager) -> Optional[List]:
+        """
+        Execute all tool calls from Claude's response.
+
+        Tool calls are I/O-bound (vector store queries), so independent calls
+        run concurrently on the shared executor. Results are collected in
+        submission order so the conversation context Claude sees is unchanged.
+
+        Args:
+            response: Claude's response containing tool calls
+            tool_manager: Tool execution manager
+
+        Returns:
+            List of tool results or None if execution fails
+        """
+        # Collect all tool use blocks and submit them in one batch; a
+        # batch_tool block fans out into one future per wrapped invocation
+        tool_blocks = [
+            content_block for content_block in response.content
+            if content_block.type == "tool_use"
+        ]
+
+        futures = []
+        for block in tool_blocks:
+            if block.name == "batch_tool":
+                batch_futures = [
+                    self._executor.submit(
+                        tool_manager.execute_tool,
+                        invocation["name"],
+                        **invocation.get("arguments", {})
+                    )
+                    for invocation in block.input.get("invocations", [])
+                ]
+                futures.append((block.id, batch_futures))
+            else:
+                futures.append(
+                    (block.id, self._executor.submit(tool_manager.execute_tool, block.name, **block.input))
+                )
+
+        tool_results = []
+        for tool_use_id, future in futures:
+            if isinstance(future, list):
+                # Batched invocations collapse into a single tool_result
+                content = "\n\n".join(self._collect_tool_result(f) for f in future)
+            else:
+                content = self._collect_tool_result(future)
+
+            tool_results.append({
+                "type": "tool_result",
+                "tool_use_id": tool_use_id,
+                "content": content
+            })
+
+        return tool_results if tool_results else None
+
+    @staticmethod
+    def _collect_tool_result(future) -> str:
+        """Resolve a tool future, converting execution errors into result text"""
+        try:
+            return future.result()
+        except Exception as e:
+            return f"Error executing tool: {str(e)}"
+    
+    def _make_final_call(self, messages: List, system_content: List) -> str:
+        """
+        Make final API call without tools to get Claude's final response.
+        
+        Args:
+            messages: Complete conversation history
+            system_content: System prompt content
+            
+        Returns:
+            Final response text
+        """
+        final_params = {
+            **self.base_params,
+            "messages": messages,
+            "system": system_content
+            # Intentionally no tools for final response
+        }
+
+        cache_key = None
+        if self.cache_enabled:
+            # Key on the stable flow content (volatile tool_use ids
+            # stripped) plus system_content, which carries the conversation
+            # history -- identical tool flows from different sessions must
+            # not share an entry
+            cache_key = self._cache_key(
+                self._stable_flow_parts(messages), system_content)
+            if cache_key in self._response_cache:
+                return self._response_cache[cache_key]
+
+        final_response = self._stream_message(final_params)
+        result = final_response.content[0].text
+        if cache_key is not None:
+            self._cache_store(cache_key, result)
+        return result
@@ -7,6 +7,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Union, Dict
+import asyncio
 import os
 
 from config import config
@@ -71,8 +72,9 @@ async def query_documents(request: QueryRequest):
         if not session_id:
             session_id = rag_system.session_manager.create_session()
         
-        # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
+        # Process query on a worker thread so the multi-round tool-calling
+        # flow doesn't block the event loop for other requests
+        answer, sources = await asyncio.to_thread(rag_system.query, request.query, session_id)
         
         return QueryResponse(
             answer=answer,
@@ -105,7 +107,7 @@ async def cleanup_session(request: SessionCleanupRequest):
 async def get_course_stats():
     """Get course analytics and statistics"""
     try:
-        analytics = rag_system.get_course_analytics()
+        analytics = await asyncio.to_thread(rag_system.get_course_analytics)
         return CourseStats(
             total_courses=analytics["total_courses"],
             course_titles=analytics["course_titles"]
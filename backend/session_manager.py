@@ -14,6 +14,8 @@ class SessionManager:
         self.max_history = max_history
         self.sessions: Dict[str, List[Message]] = {}
         self.session_counter = 0
+        # Formatted history strings, rebuilt only when a session changes
+        self._formatted_history: Dict[str, str] = {}
     
     def create_session(self) -> str:
         """Create a new conversation session"""
@@ -33,6 +35,9 @@ class SessionManager:
         # Keep conversation history within limits
         if len(self.sessions[session_id]) > self.max_history * 2:
             self.sessions[session_id] = self.sessions[session_id][-self.max_history * 2:]
+
+        # Invalidate the cached formatted history for this session
+        self._formatted_history.pop(session_id, None)
     
     def add_exchange(self, session_id: str, user_message: str, assistant_message: str):
         """Add a complete question-answer exchange"""
@@ -47,15 +52,23 @@ class SessionManager:
         messages = self.sessions[session_id]
         if not messages:
             return None
-        
+
+        # Reuse the cached string for steady-state sessions
+        cached = self._formatted_history.get(session_id)
+        if cached is not None:
+            return cached
+
         # Format messages for context
         formatted_messages = []
         for msg in messages:
             formatted_messages.append(f"{msg.role.title()}: {msg.content}")
-        
-        return "\n".join(formatted_messages)
+
+        formatted = "\n".join(formatted_messages)
+        self._formatted_history[session_id] = formatted
+        return formatted
     
     def clear_session(self, session_id: str):
         """Clear all messages from a session"""
         if session_id in self.sessions:
-            self.sessions[session_id] = []
\ No newline at end of file
+            self.sessions[session_id] = []
+        self._formatted_history.pop(session_id, None)
\ No newline at end of file
@@ -3,23 +3,22 @@ Shared test fixtures and configuration for the RAG system tests
 """
 
 import pytest
+import pytest_asyncio
 import tempfile
 import shutil
 import os
-from unittest.mock import Mock, patch, AsyncMock
+from unittest.mock import Mock, MagicMock, patch, AsyncMock
+import httpx
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 
-# Import necessary components
-import sys
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from config import Config
-from rag_system import RAGSystem
-from vector_store import VectorStore
-from session_manager import SessionManager
+# backend/ is on the import path via pythonpath in pyproject.toml. The
+# backend modules are imported inside the fixtures that spec mocks against
+# them rather than here: vector_store drags in chromadb (sqlite, onnx) at
+# import, and pulling the whole graph at collection time would tax every
+# run -- including ones that only exercise the endpoint tests.
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -38,14 +37,79 @@ def temp_dir():
 @pytest.fixture
 def test_config(temp_dir):
     """Create a test configuration with temporary paths"""
+    from config import Config
+
     config = Config()
     config.CHROMA_PATH = os.path.join(temp_dir, "test_chroma")
     config.ANTHROPIC_API_KEY = "test_key"
     return config
 
+@pytest.fixture(scope="module")
+def ai_generator():
+    """Shared AIGenerator; construction no longer builds an API client"""
+    from ai_generator import AIGenerator
+
+    return AIGenerator("test_api_key", "claude-sonnet-4-20250514")
+
+@pytest.fixture(autouse=True)
+def _reset_ai_generator_state(request):
+    """
+    Reset AIGenerator's shared client and, when the module-scoped generator
+    is in play, its per-instance caches between tests so patched clients and
+    cached responses never leak from one test into the next.
+    """
+    from ai_generator import AIGenerator
+
+    AIGenerator._shared_client = None
+    if "ai_generator" in request.fixturenames:
+        generator = request.getfixturevalue("ai_generator")
+        generator._response_cache.clear()
+        generator._prepared_tools.clear()
+    yield
+    AIGenerator._shared_client = None
+
+# Built once at import; the schema is never mutated by tests, so every
+# module shares the same structure instead of re-allocating the literal.
+# A tuple (rather than a list) makes accidental in-place mutation fail loudly.
+_TOOL_DEFINITIONS = (
+    {
+        "name": "search_course_content",
+        "description": "Search course materials",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "What to search for"},
+                "course_name": {"type": "string", "description": "Course name filter"},
+                "lesson_number": {"type": "integer", "description": "Lesson number filter"}
+            },
+            "required": ["query"]
+        }
+    },
+)
+
+@pytest.fixture(scope="module")
+def tool_definitions():
+    """Tool schema passed to generate_response; never mutated by tests"""
+    return _TOOL_DEFINITIONS
+
 @pytest.fixture
+def mock_anthropic(monkeypatch):
+    """
+    Patched Anthropic constructor for the generator module.
+
+    monkeypatch.setattr is cheaper than a per-test mock.patch decorator
+    (no _patch object, no start/stop bookkeeping) and centralizes the
+    patch target in one place.
+    """
+    cls = MagicMock()
+    monkeypatch.setattr("ai_generator.anthropic.Anthropic", cls)
+    return cls
+
+@pytest.fixture(scope="module")
 def mock_vector_store():
     """Mock vector store for testing"""
+    from vector_store import VectorStore
+
     mock_store = Mock(spec=VectorStore)
     mock_store.search_course_catalog.return_value = []
     mock_store.search_course_content.return_value = []
@@ -54,9 +118,11 @@ def mock_vector_store():
     mock_store.get_all_course_titles.return_value = []
     return mock_store
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_session_manager():
     """Mock session manager for testing"""
+    from session_manager import SessionManager
+
     mock_manager = Mock(spec=SessionManager)
     mock_manager.create_session.return_value = "test_session_123"
     mock_manager.get_conversation_history.return_value = []
@@ -64,7 +130,7 @@ def mock_session_manager():
     mock_manager.clear_session.return_value = None
     return mock_manager
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_anthropic_client():
     """Mock Anthropic client for testing"""
     mock_client = AsyncMock()
@@ -74,9 +140,11 @@ def mock_anthropic_client():
     mock_client.messages.create.return_value = mock_response
     return mock_client
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_rag_system(mock_vector_store, mock_session_manager):
     """Mock RAG system with dependencies"""
+    from rag_system import RAGSystem
+
     mock_rag = Mock(spec=RAGSystem)
     mock_rag.vector_store = mock_vector_store
     mock_rag.session_manager = mock_session_manager
@@ -87,7 +155,7 @@ def mock_rag_system(mock_vector_store, mock_session_manager):
     }
     return mock_rag
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def test_app():
     """Create a test FastAPI app without static file mounting"""
     from pydantic import BaseModel
@@ -126,15 +194,30 @@ def test_app():
         success: bool
         message: str
     
-    # Mock RAG system for the test app
-    mock_rag_system = Mock()
-    mock_rag_system.query.return_value = ("Test answer", ["Test source"])
-    mock_rag_system.get_course_analytics.return_value = {
-        "total_courses": 2,
-        "course_titles": ["Course 1", "Course 2"]
-    }
-    mock_rag_system.session_manager.create_session.return_value = "test_session_123"
-    mock_rag_system.session_manager.clear_session.return_value = None
+    # Deterministic in-process stand-in for the RAG pipeline. The endpoint
+    # tests only assert on response schema, so a plain class returning fixed
+    # values keeps every request O(1) -- no Mock attribute machinery, no
+    # vector store, no model client.
+    class FakeSessionManager:
+        def create_session(self):
+            return "test_session_123"
+
+        def clear_session(self, session_id):
+            return None
+
+    class FakeRAGSystem:
+        session_manager = FakeSessionManager()
+
+        def query(self, query, session_id=None):
+            return ("Test answer", ["Test source"])
+
+        def get_course_analytics(self):
+            return {
+                "total_courses": 2,
+                "course_titles": ["Course 1", "Course 2"]
+            }
+
+    mock_rag_system = FakeRAGSystem()
     
     @app.post("/api/query", response_model=QueryResponse)
     async def query_documents(request: QueryRequest):
@@ -176,12 +259,32 @@ def test_app():
     
     return app
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client(test_app):
-    """Create a test client for the FastAPI app"""
-    return TestClient(test_app)
+    """One TestClient for the whole run; tests only read responses, never
+    mutate app state, so route-table construction happens exactly once.
 
-@pytest.fixture
+    Entering the client as a context manager also runs the app's lifespan
+    (startup/shutdown) exactly once per session instead of per test.
+    """
+    with TestClient(test_app) as test_client:
+        yield test_client
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def async_client(test_app):
+    """ASGI-transport client for hot-path endpoint tests.
+
+    Talks to the app in-process on the event loop, skipping the
+    portal/thread hand-off TestClient performs on every request --
+    that hand-off dominates tiny-payload endpoint tests.
+    """
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver"
+    ) as ac:
+        yield ac
+
+@pytest.fixture(scope="session")
 def sample_query_request():
     """Sample query request data for testing"""
     return {
@@ -189,7 +292,7 @@ def sample_query_request():
         "session_id": "test_session_123"
     }
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_course_data():
     """Sample course data for testing"""
     return [
@@ -214,6 +317,21 @@ def sample_course_data():
         }
     ]
 
+@pytest.fixture(autouse=True)
+def reset_shared_mocks(request):
+    """
+    Clear call history on the module-scoped mocks after each test.
+
+    The mock fixtures are built once per module instead of per test; a
+    reset_mock() between tests keeps them isolated without paying for a
+    fresh spec'd Mock tree every time.
+    """
+    yield
+    for name in ("mock_vector_store", "mock_session_manager",
+                 "mock_rag_system", "mock_anthropic_client"):
+        if name in request.fixturenames:
+            request.getfixturevalue(name).reset_mock()
+
 @pytest.fixture(autouse=True)
 def mock_environment_variables():
     """Mock environment variables for testing"""
@@ -1,548 +1,438 @@
-import unittest
-import sys
-import os
-from unittest.mock import Mock, patch, MagicMock
-
-# Add parent directory to path to import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from ai_generator import AIGenerator
-from search_tools import ToolManager, CourseSearchTool
-
-
-class TestAIGenerator(unittest.TestCase):
-    """Test cases for AIGenerator tool calling functionality"""
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        # Create AIGenerator with mock API key and model
-        self.ai_generator = AIGenerator("test_api_key", "claude-sonnet-4-20250514")
-        
-        # Create mock tool manager and tools
-        self.mock_tool_manager = Mock(spec=ToolManager)
-        self.mock_search_tool = Mock(spec=CourseSearchTool)
-        
-        # Mock tool definitions
-        self.tool_definitions = [
-            {
-                "name": "search_course_content",
-                "description": "Search course materials",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string", "description": "What to search for"},
-                        "course_name": {"type": "string", "description": "Course name filter"},
-                        "lesson_number": {"type": "integer", "description": "Lesson number filter"}
-                    },
-                    "required": ["query"]
-                }
-            }
-        ]
-    
-    @patch('anthropic.Anthropic')
-    def test_generate_response_without_tools(self, mock_anthropic_client):
-        """Test basic response generation without tool usage"""
-        # Mock Claude API response
-        mock_response = Mock()
-        mock_response.content = [Mock()]
-        mock_response.content[0].text = "This is a general knowledge answer"
-        mock_response.stop_reason = "end_turn"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.return_value = mock_response
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Test response generation
-        result = self.ai_generator.generate_response("What is Python?")
-        
-        # Verify API was called correctly
-        mock_client_instance.messages.create.assert_called_once()
-        call_args = mock_client_instance.messages.create.call_args[1]
-        
-        self.assertEqual(call_args['model'], "claude-sonnet-4-20250514")
-        self.assertEqual(call_args['temperature'], 0)
-        self.assertEqual(call_args['max_tokens'], 800)
-        self.assertEqual(call_args['messages'], [{"role": "user", "content": "What is Python?"}])
-        self.assertIn("You are an AI assistant", call_args['system'])
-        
-        # Verify no tools were used
-        self.assertNotIn('tools', call_args)
-        
-        self.assertEqual(result, "This is a general knowledge answer")
-    
-    @patch('anthropic.Anthropic')
-    def test_generate_response_with_conversation_history(self, mock_anthropic_client):
-        """Test response generation with conversation history"""
-        mock_response = Mock()
-        mock_response.content = [Mock()]
-        mock_response.content[0].text = "Answer with context"
-        mock_response.stop_reason = "end_turn"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.return_value = mock_response
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Test with history
-        history = "User: Previous question\nAssistant: Previous answer"
-        result = self.ai_generator.generate_response(
-            "Follow-up question", 
-            conversation_history=history
-        )
-        
-        # Verify history was included in system prompt
-        call_args = mock_client_instance.messages.create.call_args[1]
-        self.assertIn("Previous conversation:", call_args['system'])
-        self.assertIn("User: Previous question", call_args['system'])
-    
-    @patch('anthropic.Anthropic')
-    def test_generate_response_with_tools_no_tool_use(self, mock_anthropic_client):
-        """Test response with tools available but no tool use triggered"""
-        mock_response = Mock()
-        mock_response.content = [Mock()]
-        mock_response.content[0].text = "Direct answer without tools"
-        mock_response.stop_reason = "end_turn"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.return_value = mock_response
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        result = self.ai_generator.generate_response(
-            "What is machine learning?",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify tools were provided to API
-        call_args = mock_client_instance.messages.create.call_args[1]
-        self.assertEqual(call_args['tools'], self.tool_definitions)
-        self.assertEqual(call_args['tool_choice'], {"type": "auto"})
-        
-        # Verify no tool execution occurred
-        self.mock_tool_manager.execute_tool.assert_not_called()
-        
-        self.assertEqual(result, "Direct answer without tools")
-    
-    @patch('anthropic.Anthropic')
-    def test_generate_response_with_tool_use(self, mock_anthropic_client):
-        """Test response generation when Claude decides to use tools"""
-        # Mock initial response with tool use
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_call_123"
-        mock_tool_use.input = {"query": "MCP basics", "course_name": "MCP"}
-        
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_use]
-        mock_initial_response.stop_reason = "tool_use"
-        
-        # Mock final response after tool execution
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Based on the search results: MCP stands for..."
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_initial_response,  # Initial call with tool use
-            mock_final_response     # Final call after tool execution
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock tool execution
-        self.mock_tool_manager.execute_tool.return_value = "MCP (Model Context Protocol) is..."
-        
-        result = self.ai_generator.generate_response(
-            "What is MCP?",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify tool was executed
-        self.mock_tool_manager.execute_tool.assert_called_once_with(
-            "search_course_content",
-            query="MCP basics",
-            course_name="MCP"
-        )
-        
-        # Verify two API calls were made
-        self.assertEqual(mock_client_instance.messages.create.call_count, 2)
-        
-        # Check the second call includes tool results
-        second_call_args = mock_client_instance.messages.create.call_args_list[1][1]
-        messages = second_call_args['messages']
-        
-        # Should have: original user message, assistant tool use, tool results
-        self.assertEqual(len(messages), 3)
-        self.assertEqual(messages[0]['role'], 'user')
-        self.assertEqual(messages[1]['role'], 'assistant')
-        self.assertEqual(messages[2]['role'], 'user')
-        
-        # Tool result should be in the last message
-        tool_result = messages[2]['content'][0]
-        self.assertEqual(tool_result['type'], 'tool_result')
-        self.assertEqual(tool_result['tool_use_id'], 'tool_call_123')
-        self.assertEqual(tool_result['content'], 'MCP (Model Context Protocol) is...')
-        
-        self.assertEqual(result, "Based on the search results: MCP stands for...")
-    
-    @patch('anthropic.Anthropic')
-    def test_handle_tool_execution_multiple_tools(self, mock_anthropic_client):
-        """Test handling multiple tool calls in one response"""
-        # Mock multiple tool uses
-        mock_tool_use_1 = Mock()
-        mock_tool_use_1.type = "tool_use"
-        mock_tool_use_1.name = "search_course_content"
-        mock_tool_use_1.id = "tool_1"
-        mock_tool_use_1.input = {"query": "basics"}
-        
-        mock_tool_use_2 = Mock()
-        mock_tool_use_2.type = "tool_use"
-        mock_tool_use_2.name = "get_course_outline"
-        mock_tool_use_2.id = "tool_2"
-        mock_tool_use_2.input = {"course_title": "MCP"}
-        
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_use_1, mock_tool_use_2]
-        mock_initial_response.stop_reason = "tool_use"
-        
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Combined response from multiple tools"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_initial_response,
-            mock_final_response
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock multiple tool executions
-        self.mock_tool_manager.execute_tool.side_effect = [
-            "Search result 1",
-            "Outline result 2"
-        ]
-        
-        result = self.ai_generator.generate_response(
-            "Tell me about MCP",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify both tools were executed
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 2)
-        
-        # Check tool execution calls
-        calls = self.mock_tool_manager.execute_tool.call_args_list
-        self.assertEqual(calls[0][0], ("search_course_content",))
-        self.assertEqual(calls[0][1], {"query": "basics"})
-        self.assertEqual(calls[1][0], ("get_course_outline",))
-        self.assertEqual(calls[1][1], {"course_title": "MCP"})
-    
-    @patch('anthropic.Anthropic')
-    def test_tool_execution_error_handling(self, mock_anthropic_client):
-        """Test error handling during tool execution"""
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_error"
-        mock_tool_use.input = {"query": "test"}
-        
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_use]
-        mock_initial_response.stop_reason = "tool_use"
-        
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Error was handled gracefully"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_initial_response,
-            mock_final_response
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock tool execution error
-        self.mock_tool_manager.execute_tool.return_value = "Tool execution failed: Database error"
-        
-        result = self.ai_generator.generate_response(
-            "Error test",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify error message was passed back to Claude
-        second_call_args = mock_client_instance.messages.create.call_args_list[1][1]
-        tool_result = second_call_args['messages'][2]['content'][0]
-        self.assertEqual(tool_result['content'], 'Tool execution failed: Database error')
-        
-        self.assertEqual(result, "Error was handled gracefully")
-    
-    @patch('anthropic.Anthropic')
-    def test_sequential_tool_calling_two_rounds(self, mock_anthropic_client):
-        """Test that AI can make sequential tool calls across 2 rounds"""
-        # Mock first round: Claude makes initial tool call
-        mock_tool_use_1 = Mock()
-        mock_tool_use_1.type = "tool_use"
-        mock_tool_use_1.name = "get_course_outline"
-        mock_tool_use_1.id = "tool_1"
-        mock_tool_use_1.input = {"course_title": "MCP"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use_1]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Mock second round: Claude makes follow-up tool call after seeing first results
-        mock_tool_use_2 = Mock()
-        mock_tool_use_2.type = "tool_use"
-        mock_tool_use_2.name = "search_course_content"
-        mock_tool_use_2.id = "tool_2"
-        mock_tool_use_2.input = {"query": "lesson 4 content", "course_name": "MCP"}
-        
-        mock_response_2 = Mock()
-        mock_response_2.content = [mock_tool_use_2]
-        mock_response_2.stop_reason = "tool_use"
-        
-        # Mock final response: Claude provides final answer after both tool calls
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Based on both searches: MCP Lesson 4 covers advanced topics"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_response_1,      # First round tool call
-            mock_response_2,      # Second round tool call
-            mock_final_response   # Final response without tools
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock tool executions
-        self.mock_tool_manager.execute_tool.side_effect = [
-            "Course outline for MCP with Lesson 4: Advanced Features",
-            "Lesson 4 content: Advanced MCP features and implementation"
-        ]
-        
-        result = self.ai_generator.generate_response(
-            "What does lesson 4 of MCP course cover?",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify 3 API calls were made (2 rounds + final response)
-        self.assertEqual(mock_client_instance.messages.create.call_count, 3)
-        
-        # Verify both tools were executed
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 2)
-        
-        # Check tool execution sequence
-        calls = self.mock_tool_manager.execute_tool.call_args_list
-        self.assertEqual(calls[0][0], ("get_course_outline",))
-        self.assertEqual(calls[1][0], ("search_course_content",))
-        
-        # Verify final response
-        self.assertIn("Based on both searches", result)
-    
-    @patch('anthropic.Anthropic')
-    def test_sequential_tool_calling_early_termination(self, mock_anthropic_client):
-        """Test that sequential calling terminates when Claude doesn't need more tools"""
-        # Mock first round with tool use
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_1"
-        mock_tool_use.input = {"query": "Python basics"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Mock second round: Claude provides final answer (no more tools)
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Python is a programming language used for..."
-        mock_final_response.stop_reason = "end_turn"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_response_1,      # First round with tools
-            mock_final_response   # Second round, no tools needed
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock tool execution
-        self.mock_tool_manager.execute_tool.return_value = "Python basics content"
-        
-        result = self.ai_generator.generate_response(
-            "What is Python?",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify only 2 API calls (1 tool round + 1 final response)
-        self.assertEqual(mock_client_instance.messages.create.call_count, 2)
-        
-        # Verify only 1 tool was executed
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 1)
-        
-        self.assertEqual(result, "Python is a programming language used for...")
-    
-    @patch('anthropic.Anthropic')
-    def test_sequential_tool_calling_max_rounds_limit(self, mock_anthropic_client):
-        """Test that sequential calling respects maximum round limit"""
-        # Mock responses for multiple rounds, all with tool use
-        mock_tool_use_1 = Mock()
-        mock_tool_use_1.type = "tool_use"
-        mock_tool_use_1.name = "search_course_content"
-        mock_tool_use_1.id = "tool_1"
-        mock_tool_use_1.input = {"query": "first search"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use_1]
-        mock_response_1.stop_reason = "tool_use"
-        
-        mock_tool_use_2 = Mock()
-        mock_tool_use_2.type = "tool_use"
-        mock_tool_use_2.name = "search_course_content"
-        mock_tool_use_2.id = "tool_2"
-        mock_tool_use_2.input = {"query": "second search"}
-        
-        mock_response_2 = Mock()
-        mock_response_2.content = [mock_tool_use_2]
-        mock_response_2.stop_reason = "tool_use"
-        
-        # Final response when max rounds reached
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Final answer after max rounds reached"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_response_1,      # Round 1
-            mock_response_2,      # Round 2 (max reached)
-            mock_final_response   # Final call without tools
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock tool executions
-        self.mock_tool_manager.execute_tool.side_effect = [
-            "First search result",
-            "Second search result"
-        ]
-        
-        result = self.ai_generator.generate_response(
-            "Complex query requiring multiple searches",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager,
-            max_rounds=2  # Explicitly set max rounds
-        )
-        
-        # Verify 3 API calls (2 rounds + final without tools)
-        self.assertEqual(mock_client_instance.messages.create.call_count, 3)
-        
-        # Verify 2 tool executions (max rounds reached)
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 2)
-        
-        # Verify final call was made without tools
-        final_call_args = mock_client_instance.messages.create.call_args_list[2][1]
-        self.assertNotIn('tools', final_call_args)
-        
-        self.assertEqual(result, "Final answer after max rounds reached")
-    
-    @patch('anthropic.Anthropic')
-    def test_sequential_tool_calling_tool_execution_error(self, mock_anthropic_client):
-        """Test graceful handling of tool execution errors in sequential calls"""
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_error"
-        mock_tool_use.input = {"query": "test"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Second round should continue despite tool error
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Handled error gracefully and provided partial answer"
-        mock_final_response.stop_reason = "end_turn"
-        
-        mock_client_instance = Mock()
-        mock_client_instance.messages.create.side_effect = [
-            mock_response_1,
-            mock_final_response
-        ]
-        mock_anthropic_client.return_value = mock_client_instance
-        
-        # Mock tool execution error
-        self.mock_tool_manager.execute_tool.side_effect = Exception("Database connection failed")
-        
-        result = self.ai_generator.generate_response(
-            "Test error handling",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Should still complete successfully with error handling
-        self.assertIn("Handled error gracefully", result)
-        
-        # Verify error was passed to Claude in tool result
-        second_call_args = mock_client_instance.messages.create.call_args_list[1][1]
-        messages = second_call_args['messages']
-        
-        # Find the tool result message
-        tool_result_message = next(msg for msg in messages if msg['role'] == 'user' and 'content' in msg and isinstance(msg['content'], list))
-        tool_result = tool_result_message['content'][0]
-        
-        self.assertEqual(tool_result['type'], 'tool_result')
-        self.assertIn('Error executing tool', tool_result['content'])
-    
-    def test_system_prompt_contains_required_instructions(self):
-        """Test that the system prompt contains tool usage instructions"""
-        system_prompt = self.ai_generator.SYSTEM_PROMPT
-        
-        # Verify key instructions are present
-        self.assertIn("search_course_content", system_prompt)
-        self.assertIn("get_course_outline", system_prompt)
-        self.assertIn("Tool Usage Guidelines", system_prompt)
-        self.assertIn("Maximum 2 rounds of tool calls", system_prompt)
-        self.assertIn("Course outline questions", system_prompt)
-        self.assertIn("Course content questions", system_prompt)
-    
-    def test_base_params_initialization(self):
-        """Test that base parameters are correctly initialized"""
-        self.assertEqual(self.ai_generator.base_params['model'], "claude-sonnet-4-20250514")
-        self.assertEqual(self.ai_generator.base_params['temperature'], 0)
-        self.assertEqual(self.ai_generator.base_params['max_tokens'], 800)
-
-
-class TestAIGeneratorToolCallDetection(unittest.TestCase):
-    """Test cases for detecting when tools should be called"""
-    
-    def setUp(self):
-        """Set up fixtures for tool call detection tests"""
-        self.ai_generator = AIGenerator("test_key", "test_model")
-    
-    def test_system_prompt_course_content_detection(self):
-        """Test system prompt guides toward content search tool"""
-        system_prompt = self.ai_generator.SYSTEM_PROMPT
-        
-        # Check for content search guidance
-        self.assertIn("Course content questions", system_prompt)
-        self.assertIn("search_course_content", system_prompt)
-        
-        # Check for outline search guidance  
-        self.assertIn("Course outline questions", system_prompt)
-        self.assertIn("get_course_outline", system_prompt)
-    
-    def test_system_prompt_encourages_sequential_tools(self):
-        """Test system prompt supports sequential tool calls"""
-        system_prompt = self.ai_generator.SYSTEM_PROMPT
-        
-        self.assertIn("Sequential tool use", system_prompt)
-        self.assertIn("Maximum 2 rounds of tool calls", system_prompt)
-        self.assertIn("Sequential Reasoning", system_prompt)
-
-
-if __name__ == '__main__':
-    unittest.main(verbosity=2)
\ No newline at end of file
+"""
+Tests for AIGenerator tool calling functionality.
+
+Pytest-style: the tests are independent and mock-only, so they shard
+cleanly across workers. Locally, `pytest -n auto --dist worksteal`
+rebalances dynamically as workers finish; for fixed CI shards, record
+timings once with `pytest --store-durations` and split with
+`pytest --splits N --group i --splitting-algorithm least_duration`
+(pytest-split).
+"""
+
+import pytest
+from collections import namedtuple
+from functools import lru_cache
+from unittest.mock import Mock, MagicMock
+
+# backend/ is on the import path via pythonpath in pyproject.toml
+from ai_generator import AIGenerator
+from search_tools import ToolManager
+
+# Class-level constant, bound once so the parametrized prompt checks skip
+# per-test attribute resolution entirely
+SYSTEM_PROMPT = AIGenerator.SYSTEM_PROMPT
+
+# Passive API-response stand-ins: plain attribute access with none of
+# Mock's call-tracking overhead. Mock stays where calls are asserted
+# (the client and the tool manager).
+TextBlock = namedtuple("TextBlock", "text")
+# Text block carrying an explicit type, for responses that mix text with
+# tool_use blocks (the trailing-text reuse path inspects block.type)
+TypedTextBlock = namedtuple("TypedTextBlock", "type text")
+ToolUse = namedtuple("ToolUse", "type name id input")
+Response = namedtuple("Response", "content stop_reason")
+
+
+@lru_cache(maxsize=None)
+def _final_response(text):
+    """Frozen text-only response; identical texts share one interned object"""
+    return Response((TextBlock(text),), "end_turn")
+
+
+def make_stream(response):
+    """Build a mock streaming context manager that resolves to the given message"""
+    stream = Mock()
+    stream.text_stream = []
+    stream.get_final_message.return_value = response
+    manager = MagicMock()
+    manager.__enter__.return_value = stream
+    return manager
+
+
+def make_client(mock_anthropic, *responses):
+    """Wire a mock client returning the given responses, one per API call"""
+    instance = Mock()
+    if len(responses) == 1:
+        instance.messages.stream.return_value = make_stream(responses[0])
+    else:
+        instance.messages.stream.side_effect = [make_stream(r) for r in responses]
+    mock_anthropic.return_value = instance
+    return instance
+
+
+# Computed once at import: spec'ing each mock against the name list skips
+# the per-test inspect walk that Mock(spec=ToolManager) would repeat
+_TOOL_MANAGER_METHODS = [m for m in dir(ToolManager) if not m.startswith("_")]
+
+
+@pytest.fixture
+def mock_tool_manager():
+    """Function-scoped: tests configure side_effects and assert call counts"""
+    return Mock(spec_set=_TOOL_MANAGER_METHODS)
+
+
+def test_generate_response_without_tools(mock_anthropic, ai_generator):
+    """Test basic response generation without tool usage"""
+    mock_response = _final_response("This is a general knowledge answer")
+
+    mock_client_instance = make_client(mock_anthropic, mock_response)
+    stream = mock_client_instance.messages.stream
+
+    # Test response generation
+    result = ai_generator.generate_response("What is Python?")
+
+    # Verify API was called correctly
+    stream.assert_called_once()
+    call_args = stream.call_args.kwargs
+
+    assert call_args['model'] == "claude-sonnet-4-20250514"
+    assert call_args['temperature'] == 0
+    assert call_args['max_tokens'] == 800
+    assert call_args['messages'] == [{"role": "user", "content": "What is Python?"}]
+
+    # System prompt is sent as a cache-marked text block
+    system_text = "".join(block["text"] for block in call_args['system'])
+    assert "You are an AI assistant" in system_text
+    assert call_args['system'][0]["cache_control"] == {"type": "ephemeral"}
+
+    # Verify no tools were used
+    assert 'tools' not in call_args
+
+    assert result == "This is a general knowledge answer"
+
+
+def test_generate_response_with_conversation_history(mock_anthropic, ai_generator):
+    """Test response generation with conversation history"""
+    mock_response = _final_response("Answer with context")
+
+    mock_client_instance = make_client(mock_anthropic, mock_response)
+    stream = mock_client_instance.messages.stream
+
+    # Test with history
+    history = "User: Previous question\nAssistant: Previous answer"
+    ai_generator.generate_response(
+        "Follow-up question",
+        conversation_history=history
+    )
+
+    # Verify history was included in a system block after the cached prompt
+    call_args = stream.call_args.kwargs
+    system_text = "".join(block["text"] for block in call_args['system'])
+    assert "Previous conversation:" in system_text
+    assert "User: Previous question" in system_text
+
+
+def test_generate_response_with_tools_no_tool_use(mock_anthropic, ai_generator,
+                                                  mock_tool_manager, tool_definitions):
+    """Test response with tools available but no tool use triggered"""
+    mock_response = _final_response("Direct answer without tools")
+
+    mock_client_instance = make_client(mock_anthropic, mock_response)
+    stream = mock_client_instance.messages.stream
+
+    result = ai_generator.generate_response(
+        "What is machine learning?",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # Verify tools were provided to API (plus the injected batch pseudo-tool)
+    # with a cache marker on the last one
+    call_args = stream.call_args.kwargs
+    assert len(call_args['tools']) == len(tool_definitions) + 1
+    assert call_args['tools'][-1]["name"] == "batch_tool"
+    assert call_args['tools'][-1]["cache_control"] == {"type": "ephemeral"}
+    assert call_args['tool_choice'] == {"type": "auto"}
+
+    # Verify no tool execution occurred
+    mock_tool_manager.execute_tool.assert_not_called()
+
+    assert result == "Direct answer without tools"
+
+
+@pytest.mark.parametrize("tool_outcome,expected_tool_result,final_text", [
+    # Successful search: the result is passed back verbatim
+    ("MCP (Model Context Protocol) is...",
+     "MCP (Model Context Protocol) is...",
+     "Based on the search results: MCP stands for..."),
+    # Tool-reported failure: the error string is still a normal tool result
+    ("Tool execution failed: Database error",
+     "Tool execution failed: Database error",
+     "Error was handled gracefully"),
+    # Tool raises: the exception is wrapped into an error tool result
+    (Exception("Database connection failed"),
+     "Error executing tool",
+     "Handled error gracefully and provided partial answer"),
+])
+def test_generate_response_with_tool_use(mock_anthropic, ai_generator, mock_tool_manager,
+                                         tool_definitions, tool_outcome,
+                                         expected_tool_result, final_text):
+    """Test one round of tool use: success, tool-level error, and raised error"""
+    tool_use = ToolUse("tool_use", "search_course_content", "tool_call_123",
+                       {"query": "MCP basics", "course_name": "MCP"})
+    initial_response = Response([tool_use], "tool_use")
+    final_response = _final_response(final_text)
+
+    mock_client_instance = make_client(mock_anthropic,
+                                       initial_response,
+                                       final_response)
+    stream = mock_client_instance.messages.stream
+
+    # Mock tool execution (raising outcomes become side effects)
+    if isinstance(tool_outcome, Exception):
+        mock_tool_manager.execute_tool.side_effect = tool_outcome
+    else:
+        mock_tool_manager.execute_tool.return_value = tool_outcome
+
+    result = ai_generator.generate_response(
+        "What is MCP?",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # Verify tool was executed
+    mock_tool_manager.execute_tool.assert_called_once_with(
+        "search_course_content",
+        query="MCP basics",
+        course_name="MCP"
+    )
+
+    # Verify two API calls were made
+    assert stream.call_count == 2
+
+    # Check the second call includes tool results
+    calls = stream.call_args_list
+    messages = calls[1].kwargs['messages']
+
+    # Should have: original user message, assistant tool use, tool results
+    assert len(messages) == 3
+    assert messages[0]['role'] == 'user'
+    assert messages[1]['role'] == 'assistant'
+    assert messages[2]['role'] == 'user'
+
+    # Tool result should be in the last message
+    tool_result = messages[2]['content'][0]
+    assert tool_result['type'] == 'tool_result'
+    assert tool_result['tool_use_id'] == 'tool_call_123'
+    assert expected_tool_result in tool_result['content']
+
+    assert result == final_text
+
+
+def test_handle_tool_execution_multiple_tools(mock_anthropic, ai_generator,
+                                              mock_tool_manager, tool_definitions):
+    """Test handling multiple tool calls in one response"""
+    initial_response = Response([
+        ToolUse("tool_use", "search_course_content", "tool_1", {"query": "basics"}),
+        ToolUse("tool_use", "get_course_outline", "tool_2", {"course_title": "MCP"})
+    ], "tool_use")
+    final_response = _final_response("Combined response from multiple tools")
+
+    mock_client_instance = make_client(mock_anthropic,
+                                       initial_response,
+                                       final_response)
+    stream = mock_client_instance.messages.stream
+
+    # Mock multiple tool executions
+    mock_tool_manager.execute_tool.side_effect = [
+        "Search result 1",
+        "Outline result 2"
+    ]
+
+    ai_generator.generate_response(
+        "Tell me about MCP",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # Verify both tools were executed
+    assert mock_tool_manager.execute_tool.call_count == 2
+
+    # Check tool execution calls (concurrent execution does not guarantee order)
+    mock_tool_manager.execute_tool.assert_any_call("search_course_content", query="basics")
+    mock_tool_manager.execute_tool.assert_any_call("get_course_outline", course_title="MCP")
+
+
+@pytest.mark.parametrize("rounds,max_rounds,expected_api_calls", [
+    (2, None, 3),  # two rounds of tool use, then a final synthesis call
+    (1, None, 2),  # early termination: second response needs no tools
+    (2, 2, 3),     # explicit max_rounds cap is respected
+])
+def test_sequential_tool_calling(mock_anthropic, ai_generator, mock_tool_manager,
+                                 tool_definitions, rounds, max_rounds,
+                                 expected_api_calls):
+    """Test the sequential tool-calling loop across round counts and caps"""
+    responses = [
+        Response([ToolUse("tool_use", "search_course_content", f"tool_{i}",
+                          {"query": f"search {i}"})], "tool_use")
+        for i in range(rounds)
+    ]
+    responses.append(_final_response("Final answer after tool rounds"))
+
+    mock_client_instance = make_client(mock_anthropic, *responses)
+    stream = mock_client_instance.messages.stream
+
+    # One tool result per round
+    mock_tool_manager.execute_tool.side_effect = [f"result {i}" for i in range(rounds)]
+
+    kwargs = {"tools": tool_definitions, "tool_manager": mock_tool_manager}
+    if max_rounds is not None:
+        kwargs["max_rounds"] = max_rounds
+
+    result = ai_generator.generate_response("Query needing tools", **kwargs)
+
+    # One API call per tool round, plus the final response
+    assert stream.call_count == expected_api_calls
+    assert mock_tool_manager.execute_tool.call_count == rounds
+
+    # When the round cap was hit, the synthesis call goes out without tools
+    if rounds == (max_rounds or 2):
+        calls = stream.call_args_list
+        assert 'tools' not in calls[-1].kwargs
+
+    assert result == "Final answer after tool rounds"
+
+
+def test_trailing_text_at_round_cap_skips_final_call(mock_anthropic, ai_generator,
+                                                     mock_tool_manager,
+                                                     tool_definitions):
+    """Text alongside tool_use at the round cap is reused, saving the final call"""
+    responses = [
+        Response([ToolUse("tool_use", "search_course_content", "tool_0",
+                          {"query": "first search"})], "tool_use"),
+        # The capped round carries partial text next to its tool_use block
+        Response([
+            TypedTextBlock("text", "Partial answer from "),
+            TypedTextBlock("text", "accumulated results"),
+            ToolUse("tool_use", "search_course_content", "tool_1",
+                    {"query": "second search"}),
+        ], "tool_use"),
+    ]
+
+    mock_client_instance = make_client(mock_anthropic, *responses)
+    stream = mock_client_instance.messages.stream
+    mock_tool_manager.execute_tool.return_value = "result"
+
+    result = ai_generator.generate_response(
+        "Query needing tools",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # The joined text blocks come back directly: two tool rounds, and no
+    # third (synthesis) API call
+    assert result == "Partial answer from accumulated results"
+    assert stream.call_count == 2
+    assert mock_tool_manager.execute_tool.call_count == 2
+
+
+def test_response_cache_serves_repeated_query(mock_anthropic, ai_generator):
+    """A repeated tool-less query is served from the cache without an API call"""
+    mock_client_instance = make_client(mock_anthropic,
+                                       _final_response("Cached answer"))
+    stream = mock_client_instance.messages.stream
+
+    first = ai_generator.generate_response("What is Python?")
+    second = ai_generator.generate_response("What is Python?")
+
+    assert first == second == "Cached answer"
+    stream.assert_called_once()
+
+
+def test_final_call_cache_hits_across_tool_use_ids(mock_anthropic, ai_generator,
+                                                   mock_tool_manager,
+                                                   tool_definitions):
+    """The synthesis cache keys on flow content, not volatile tool_use ids"""
+    def tool_rounds(prefix):
+        # Same query/tool flow each time; only the server-assigned ids differ
+        return [
+            Response([ToolUse("tool_use", "search_course_content", f"{prefix}_0",
+                              {"query": "basics"})], "tool_use"),
+            Response([ToolUse("tool_use", "search_course_content", f"{prefix}_1",
+                              {"query": "details"})], "tool_use"),
+        ]
+
+    # First run pays the synthesis call; the replay must not need one
+    mock_client_instance = make_client(
+        mock_anthropic,
+        *tool_rounds("toolu_aaa"),
+        _final_response("Synthesized answer"),
+        *tool_rounds("toolu_bbb"),
+    )
+    stream = mock_client_instance.messages.stream
+    mock_tool_manager.execute_tool.side_effect = ["result 1", "result 2"] * 2
+
+    first = ai_generator.generate_response("What is MCP?",
+                                           tools=tool_definitions,
+                                           tool_manager=mock_tool_manager)
+    second = ai_generator.generate_response("What is MCP?",
+                                            tools=tool_definitions,
+                                            tool_manager=mock_tool_manager)
+
+    assert first == second == "Synthesized answer"
+    # Two tool rounds per run plus exactly one synthesis call overall
+    assert stream.call_count == 5
+
+
+def test_response_cache_disabled_bypasses_cache(mock_anthropic):
+    """cache_enabled=False makes every call hit the API and stores nothing"""
+    generator = AIGenerator("test_api_key", "claude-sonnet-4-20250514",
+                            cache_enabled=False)
+    mock_client_instance = make_client(mock_anthropic,
+                                       _final_response("Fresh answer"))
+    stream = mock_client_instance.messages.stream
+
+    assert generator.generate_response("What is Python?") == "Fresh answer"
+    assert generator.generate_response("What is Python?") == "Fresh answer"
+
+    assert stream.call_count == 2
+    assert generator._response_cache == {}
+
+
+def test_truncate_history_drops_oldest_turns(ai_generator):
+    """Over-budget history loses whole old turns and keeps the newest"""
+    # Well under budget: returned untouched
+    short = "User: hi\nAssistant: hello"
+    assert ai_generator._truncate_history(short) == short
+
+    # ~2.4x the 4000-token budget; each message body spans two lines, as
+    # real user/assistant text routinely does
+    turns = [f"User: turn {i:04d}\n" + "x" * 80 for i in range(400)]
+    history = "\n".join(turns)
+    truncated = ai_generator._truncate_history(history)
+
+    # Budget respected, and what survives is a suffix of the original
+    # that starts on a turn boundary -- never mid-message
+    assert ai_generator._estimate_tokens(truncated) <= ai_generator.max_history_tokens
+    assert 0 < len(truncated) < len(history)
+    assert history.endswith(truncated)
+    assert truncated.startswith("User: ")
+
+
+@pytest.mark.parametrize("needle", [
+    # Tool usage instructions
+    "search_course_content",
+    "get_course_outline",
+    "Tool Usage Guidelines",
+    # Routing guidance for both question types
+    "Course outline questions",
+    "Course content questions",
+    # Sequential tool calling support
+    "Sequential tool use",
+    "Sequential Reasoning",
+    "Maximum 2 rounds of tool calls",
+])
+def test_system_prompt_contains(needle):
+    """Test that the system prompt carries each required instruction"""
+    assert needle in SYSTEM_PROMPT
+
+
+def test_base_params_initialization(ai_generator):
+    """Test that base parameters are correctly initialized"""
+    assert ai_generator.base_params['model'] == "claude-sonnet-4-20250514"
+    assert ai_generator.base_params['temperature'] == 0
+    assert ai_generator.base_params['max_tokens'] == 800
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, "-v"])
@@ -1,315 +1,343 @@
-import unittest
-import sys
-import os
-from unittest.mock import Mock, patch, MagicMock
-
-# Add parent directory to path to import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from ai_generator import AIGenerator
-from search_tools import ToolManager, CourseSearchTool
-
-
-class TestSequentialToolCalling(unittest.TestCase):
-    """Test cases specifically for sequential tool calling functionality"""
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        # Mock the anthropic client at the class level
-        self.anthropic_patcher = patch('ai_generator.anthropic.Anthropic')
-        self.mock_anthropic_class = self.anthropic_patcher.start()
-        self.mock_client = Mock()
-        self.mock_anthropic_class.return_value = self.mock_client
-        
-        # Create AIGenerator (will use mocked client)
-        self.ai_generator = AIGenerator("test_api_key", "claude-sonnet-4-20250514")
-        
-        # Create mock tool manager
-        self.mock_tool_manager = Mock(spec=ToolManager)
-        
-        # Mock tool definitions
-        self.tool_definitions = [
-            {
-                "name": "search_course_content",
-                "description": "Search course materials",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string", "description": "What to search for"},
-                        "course_name": {"type": "string", "description": "Course name filter"},
-                        "lesson_number": {"type": "integer", "description": "Lesson number filter"}
-                    },
-                    "required": ["query"]
-                }
-            }
-        ]
-        
-    def tearDown(self):
-        """Clean up patches"""
-        self.anthropic_patcher.stop()
-    
-    def test_sequential_tool_calling_two_rounds(self):
-        """Test that AI can make sequential tool calls across 2 rounds"""
-        # Mock first round: Claude makes initial tool call
-        mock_tool_use_1 = Mock()
-        mock_tool_use_1.type = "tool_use"
-        mock_tool_use_1.name = "get_course_outline"
-        mock_tool_use_1.id = "tool_1"
-        mock_tool_use_1.input = {"course_title": "MCP"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use_1]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Mock second round: Claude makes follow-up tool call after seeing first results
-        mock_tool_use_2 = Mock()
-        mock_tool_use_2.type = "tool_use"
-        mock_tool_use_2.name = "search_course_content"
-        mock_tool_use_2.id = "tool_2"
-        mock_tool_use_2.input = {"query": "lesson 4 content", "course_name": "MCP"}
-        
-        mock_response_2 = Mock()
-        mock_response_2.content = [mock_tool_use_2]
-        mock_response_2.stop_reason = "tool_use"
-        
-        # Mock final response: Claude provides final answer after both tool calls
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Based on both searches: MCP Lesson 4 covers advanced topics"
-        
-        # Set up the sequence of API responses
-        self.mock_client.messages.create.side_effect = [
-            mock_response_1,      # First round tool call
-            mock_response_2,      # Second round tool call
-            mock_final_response   # Final response without tools
-        ]
-        
-        # Mock tool executions
-        self.mock_tool_manager.execute_tool.side_effect = [
-            "Course outline for MCP with Lesson 4: Advanced Features",
-            "Lesson 4 content: Advanced MCP features and implementation"
-        ]
-        
-        result = self.ai_generator.generate_response(
-            "What does lesson 4 of MCP course cover?",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify 3 API calls were made (2 rounds + final response)
-        self.assertEqual(self.mock_client.messages.create.call_count, 3)
-        
-        # Verify both tools were executed
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 2)
-        
-        # Check tool execution sequence
-        calls = self.mock_tool_manager.execute_tool.call_args_list
-        self.assertEqual(calls[0][0], ("get_course_outline",))
-        self.assertEqual(calls[1][0], ("search_course_content",))
-        
-        # Verify final response
-        self.assertIn("Based on both searches", result)
-    
-    def test_sequential_tool_calling_early_termination(self):
-        """Test that sequential calling terminates when Claude doesn't need more tools"""
-        # Mock first round with tool use
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_1"
-        mock_tool_use.input = {"query": "Python basics"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Mock second round: Claude provides final answer (no more tools)
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Python is a programming language used for..."
-        mock_final_response.stop_reason = "end_turn"
-        
-        self.mock_client.messages.create.side_effect = [
-            mock_response_1,      # First round with tools
-            mock_final_response   # Second round, no tools needed
-        ]
-        
-        # Mock tool execution
-        self.mock_tool_manager.execute_tool.return_value = "Python basics content"
-        
-        result = self.ai_generator.generate_response(
-            "What is Python?",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Verify only 2 API calls (1 tool round + 1 final response)
-        self.assertEqual(self.mock_client.messages.create.call_count, 2)
-        
-        # Verify only 1 tool was executed
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 1)
-        
-        self.assertEqual(result, "Python is a programming language used for...")
-    
-    def test_sequential_tool_calling_max_rounds_limit(self):
-        """Test that sequential calling respects maximum round limit"""
-        # Mock responses for multiple rounds, all with tool use
-        mock_tool_use_1 = Mock()
-        mock_tool_use_1.type = "tool_use"
-        mock_tool_use_1.name = "search_course_content"
-        mock_tool_use_1.id = "tool_1"
-        mock_tool_use_1.input = {"query": "first search"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use_1]
-        mock_response_1.stop_reason = "tool_use"
-        
-        mock_tool_use_2 = Mock()
-        mock_tool_use_2.type = "tool_use"
-        mock_tool_use_2.name = "search_course_content"
-        mock_tool_use_2.id = "tool_2"
-        mock_tool_use_2.input = {"query": "second search"}
-        
-        mock_response_2 = Mock()
-        mock_response_2.content = [mock_tool_use_2]
-        mock_response_2.stop_reason = "tool_use"
-        
-        # Final response when max rounds reached
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Final answer after max rounds reached"
-        
-        self.mock_client.messages.create.side_effect = [
-            mock_response_1,      # Round 1
-            mock_response_2,      # Round 2 (max reached)
-            mock_final_response   # Final call without tools
-        ]
-        
-        # Mock tool executions
-        self.mock_tool_manager.execute_tool.side_effect = [
-            "First search result",
-            "Second search result"
-        ]
-        
-        result = self.ai_generator.generate_response(
-            "Complex query requiring multiple searches",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager,
-            max_rounds=2  # Explicitly set max rounds
-        )
-        
-        # Verify 3 API calls (2 rounds + final without tools)
-        self.assertEqual(self.mock_client.messages.create.call_count, 3)
-        
-        # Verify 2 tool executions (max rounds reached)
-        self.assertEqual(self.mock_tool_manager.execute_tool.call_count, 2)
-        
-        # Verify final call was made without tools
-        final_call_args = self.mock_client.messages.create.call_args_list[2][1]
-        self.assertNotIn('tools', final_call_args)
-        
-        self.assertEqual(result, "Final answer after max rounds reached")
-    
-    def test_sequential_tool_calling_tool_execution_error(self):
-        """Test graceful handling of tool execution errors in sequential calls"""
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_error"
-        mock_tool_use.input = {"query": "test"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Second round should continue despite tool error
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Handled error gracefully and provided partial answer"
-        mock_final_response.stop_reason = "end_turn"
-        
-        self.mock_client.messages.create.side_effect = [
-            mock_response_1,
-            mock_final_response
-        ]
-        
-        # Mock tool execution error
-        self.mock_tool_manager.execute_tool.side_effect = Exception("Database connection failed")
-        
-        result = self.ai_generator.generate_response(
-            "Test error handling",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Should still complete successfully with error handling
-        self.assertIn("Handled error gracefully", result)
-        
-        # Verify error was passed to Claude in tool result
-        second_call_args = self.mock_client.messages.create.call_args_list[1][1]
-        messages = second_call_args['messages']
-        
-        # Find the tool result message
-        tool_result_message = next(msg for msg in messages if msg['role'] == 'user' and 'content' in msg and isinstance(msg['content'], list))
-        tool_result = tool_result_message['content'][0]
-        
-        self.assertEqual(tool_result['type'], 'tool_result')
-        self.assertIn('Error executing tool', tool_result['content'])
-    
-    def test_conversation_context_preservation(self):
-        """Test that conversation context is preserved across sequential tool calls"""
-        # Mock single round to test context preservation
-        mock_tool_use = Mock()
-        mock_tool_use.type = "tool_use"
-        mock_tool_use.name = "search_course_content"
-        mock_tool_use.id = "tool_1"
-        mock_tool_use.input = {"query": "test"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use]
-        mock_response_1.stop_reason = "tool_use"
-        
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "Context preserved response"
-        mock_final_response.stop_reason = "end_turn"
-        
-        self.mock_client.messages.create.side_effect = [
-            mock_response_1,
-            mock_final_response
-        ]
-        
-        self.mock_tool_manager.execute_tool.return_value = "Tool result"
-        
-        result = self.ai_generator.generate_response(
-            "Test query",
-            conversation_history="Previous: User asked about X\nAssistant: Answered about X",
-            tools=self.tool_definitions,
-            tool_manager=self.mock_tool_manager
-        )
-        
-        # Check that conversation history was included in system prompt
-        first_call_args = self.mock_client.messages.create.call_args_list[0][1]
-        self.assertIn("Previous conversation:", first_call_args['system'])
-        self.assertIn("User asked about X", first_call_args['system'])
-        
-        # Check that final response includes the context
-        self.assertEqual(result, "Context preserved response")
-    
-    def test_system_prompt_sequential_instructions(self):
-        """Test that system prompt contains sequential tool calling instructions"""
-        system_prompt = self.ai_generator.SYSTEM_PROMPT
-        
-        # Verify sequential tool calling guidance
-        self.assertIn("Sequential tool use", system_prompt)
-        self.assertIn("Maximum 2 rounds of tool calls", system_prompt)
-        self.assertIn("Sequential Reasoning", system_prompt)
-        self.assertIn("After each tool use, evaluate if you need additional information", system_prompt)
-        self.assertIn("Use follow-up searches to gather complete context", system_prompt)
-        
-        # Verify examples are provided
-        self.assertIn("get_course_outline → search_course_content → provide complete answer", system_prompt)
-
-
-if __name__ == '__main__':
-    unittest.main(verbosity=2)
\ No newline at end of file
+"""
+Tests for sequential (multi-round) tool calling in AIGenerator.
+
+Pytest-style: the round-shaped scenarios share one parametrized test and
+the module reuses the shared `ai_generator` / `mock_anthropic` fixtures
+from conftest, so collection stays cheap and the cases shard cleanly
+under `pytest -n auto`.
+"""
+
+import pytest
+from collections import namedtuple
+from unittest.mock import Mock, MagicMock
+
+# backend/ is on the import path via pythonpath in pyproject.toml
+from ai_generator import AIGenerator
+
+# Passive API-response stand-ins: the generator only reads attributes from
+# these, so plain tuples beat Mock's per-attribute bookkeeping. Mock stays
+# where calls are asserted (the client and the tool manager).
+TextBlock = namedtuple("TextBlock", "text")
+ToolUse = namedtuple("ToolUse", "type name id input")
+Response = namedtuple("Response", "content stop_reason")
+
+
+def make_stream(response):
+    """Build a mock streaming context manager that resolves to the given message"""
+    stream = Mock()
+    stream.text_stream = []
+    stream.get_final_message.return_value = response
+    manager = MagicMock()
+    manager.__enter__.return_value = stream
+    return manager
+
+
+def make_client(mock_anthropic, *responses):
+    """Wire a mock client returning the given responses, one per API call"""
+    instance = Mock()
+    instance.messages.stream.side_effect = [make_stream(r) for r in responses]
+    mock_anthropic.return_value = instance
+    return instance
+
+
+def _tool_use(name, tid, inp):
+    """tool_use content block"""
+    return ToolUse("tool_use", name, tid, inp)
+
+
+def _tool_response(content):
+    """API response that requests tool execution"""
+    return Response(content, "tool_use")
+
+
+def _final_response(text):
+    """Text-only API response ending the tool loop"""
+    return Response((TextBlock(text),), "end_turn")
+
+
+def program_client(mock_anthropic, *steps):
+    """Wire the mock client from lightweight scenario steps.
+
+    Each step is ("tool", name, input) or ("text", body); tool_use ids
+    are assigned positionally as tool_1, tool_2, ... This keeps each test
+    down to its scenario instead of repeating the response-list plumbing.
+    """
+    responses = []
+    for step in steps:
+        if step[0] == "tool":
+            _, name, inp = step
+            tool_id = f"tool_{len(responses) + 1}"
+            responses.append(_tool_response([_tool_use(name, tool_id, inp)]))
+        else:
+            responses.append(_final_response(step[1]))
+    return make_client(mock_anthropic, *responses)
+
+
+class StubToolManager:
+    """Hand-written ToolManager stand-in.
+
+    The generator only ever calls execute_tool, so a plain class with one
+    Mock attribute does the job without the dir() introspection walk that
+    Mock(spec=ToolManager) repeats on every construction.
+    """
+
+    def __init__(self):
+        self.execute_tool = Mock()
+
+
+@pytest.fixture
+def mock_tool_manager():
+    """Function-scoped: tests configure side_effects and assert call counts"""
+    return StubToolManager()
+
+
+@pytest.mark.parametrize("tool_uses,tool_results,max_rounds,expected_api_calls,final_text", [
+    pytest.param(
+        [("get_course_outline", {"course_title": "MCP"}),
+         ("search_course_content", {"query": "lesson 4 content", "course_name": "MCP"})],
+        ["Course outline for MCP with Lesson 4: Advanced Features",
+         "Lesson 4 content: Advanced MCP features and implementation"],
+        None, 3, "Based on both searches: MCP Lesson 4 covers advanced topics",
+        id="two-rounds"),
+    pytest.param(
+        [("search_course_content", {"query": "Python basics"})],
+        ["Python basics content"],
+        None, 2, "Python is a programming language used for...",
+        id="early-termination"),
+    pytest.param(
+        [("search_course_content", {"query": "first search"}),
+         ("search_course_content", {"query": "second search"})],
+        ["First search result", "Second search result"],
+        2, 3, "Final answer after max rounds reached",
+        id="max-rounds-limit"),
+])
+def test_sequential_tool_calling(mock_anthropic, ai_generator, mock_tool_manager,
+                                 tool_definitions, tool_uses, tool_results,
+                                 max_rounds, expected_api_calls, final_text):
+    """Test the sequential loop: two rounds, early termination, and the round cap"""
+    steps = [("tool", name, inp) for name, inp in tool_uses]
+    steps.append(("text", final_text))
+
+    client = program_client(mock_anthropic, *steps)
+    stream = client.messages.stream
+
+    mock_tool_manager.execute_tool.side_effect = tool_results
+
+    kwargs = {"tools": tool_definitions, "tool_manager": mock_tool_manager}
+    if max_rounds is not None:
+        kwargs["max_rounds"] = max_rounds
+
+    result = ai_generator.generate_response(
+        "Query requiring sequential searches", **kwargs
+    )
+
+    # One API call per tool round, plus the final response
+    assert stream.call_count == expected_api_calls
+
+    # Tools were executed once per round, in order
+    calls = mock_tool_manager.execute_tool.call_args_list
+    assert [c.args for c in calls] == [(name,) for name, _ in tool_uses]
+
+    # When the explicit cap was hit, the synthesis call goes out without tools
+    if max_rounds is not None:
+        assert 'tools' not in stream.call_args_list[-1].kwargs
+
+    assert result == final_text
+
+
+def test_sequential_tool_calling_tool_execution_error(mock_anthropic, ai_generator,
+                                                      mock_tool_manager,
+                                                      tool_definitions):
+    """Test graceful handling of tool execution errors in sequential calls"""
+    client = program_client(
+        mock_anthropic,
+        ("tool", "search_course_content", {"query": "test"}),
+        ("text", "Handled error gracefully and provided partial answer"),
+    )
+
+    # Mock tool execution error
+    mock_tool_manager.execute_tool.side_effect = Exception("Database connection failed")
+
+    result = ai_generator.generate_response(
+        "Test error handling",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # Should still complete successfully with error handling
+    assert "Handled error gracefully" in result
+
+    # Verify error was passed to Claude in tool result
+    messages = client.messages.stream.call_args_list[1].kwargs['messages']
+
+    # The tool results are always the last (user) message in the round
+    tool_result_message = messages[-1]
+    assert tool_result_message['role'] == 'user'
+    tool_result = tool_result_message['content'][0]
+
+    assert tool_result['type'] == 'tool_result'
+    assert 'Error executing tool' in tool_result['content']
+
+
+_OUTLINE_TOOL_DEFINITION = {
+    "name": "get_course_outline",
+    "description": "Get a course outline",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "course_title": {"type": "string", "description": "Course title"}
+        },
+        "required": ["course_title"]
+    }
+}
+
+
+def test_local_routing_forces_tool_choice_first_round(mock_anthropic, ai_generator,
+                                                      mock_tool_manager,
+                                                      tool_definitions):
+    """Test that obvious outline queries force tool_choice on round one only"""
+    client = program_client(
+        mock_anthropic,
+        ("tool", "get_course_outline", {"course_title": "MCP"}),
+        ("text", "The course has 4 lessons"),
+    )
+
+    mock_tool_manager.execute_tool.return_value = "Course outline"
+
+    result = ai_generator.generate_response(
+        "Show me the outline of the MCP course",
+        tools=[*tool_definitions, _OUTLINE_TOOL_DEFINITION],
+        tool_manager=mock_tool_manager
+    )
+
+    # First round was routed straight to the outline tool
+    calls = client.messages.stream.call_args_list
+    assert calls[0].kwargs['tool_choice'] == {"type": "tool", "name": "get_course_outline"}
+
+    # Subsequent rounds fall back to Claude's own routing
+    assert calls[1].kwargs['tool_choice'] == {"type": "auto"}
+
+    assert result == "The course has 4 lessons"
+
+
+def test_local_routing_skips_unoffered_tool(mock_anthropic, ai_generator,
+                                            mock_tool_manager, tool_definitions):
+    """Test that a classified tool absent from the offered list is not forced"""
+    client = program_client(
+        mock_anthropic,
+        ("text", "I don't have an outline tool available"),
+    )
+
+    # tool_definitions only offers search_course_content, so the outline
+    # classification must fall back to auto routing
+    result = ai_generator.generate_response(
+        "Show me the outline of the MCP course",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    calls = client.messages.stream.call_args_list
+    assert calls[0].kwargs['tool_choice'] == {"type": "auto"}
+    assert result == "I don't have an outline tool available"
+
+
+def test_batch_tool_fans_out_invocations(mock_anthropic, ai_generator,
+                                         mock_tool_manager, tool_definitions):
+    """Test that a batch_tool call executes all wrapped invocations in one round"""
+    batch_use = _tool_use("batch_tool", "batch_1", {
+        "invocations": [
+            {"name": "get_course_outline", "arguments": {"course_title": "MCP"}},
+            {"name": "search_course_content", "arguments": {"query": "lesson 4"}}
+        ]
+    })
+
+    client = make_client(
+        mock_anthropic,
+        _tool_response([batch_use]),
+        _final_response("Combined answer from batched lookups"),
+    )
+
+    mock_tool_manager.execute_tool.side_effect = [
+        "Outline result",
+        "Content result"
+    ]
+
+    result = ai_generator.generate_response(
+        "Tell me about MCP lesson 4",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # Both wrapped invocations were executed in a single round
+    assert mock_tool_manager.execute_tool.call_count == 2
+    mock_tool_manager.execute_tool.assert_any_call("get_course_outline", course_title="MCP")
+    mock_tool_manager.execute_tool.assert_any_call("search_course_content", query="lesson 4")
+
+    # Both results came back as a single tool_result message
+    calls = client.messages.stream.call_args_list
+    tool_results = calls[1].kwargs['messages'][2]['content']
+    assert len(tool_results) == 1
+    assert tool_results[0]['tool_use_id'] == 'batch_1'
+    assert "Outline result" in tool_results[0]['content']
+    assert "Content result" in tool_results[0]['content']
+
+    # batch_tool was offered alongside the registered tools
+    tool_names = [tool["name"] for tool in calls[0].kwargs['tools']]
+    assert "batch_tool" in tool_names
+
+    assert result == "Combined answer from batched lookups"
+
+
+def test_conversation_context_preservation(mock_anthropic, ai_generator,
+                                           mock_tool_manager, tool_definitions):
+    """Test that conversation context is preserved across sequential tool calls"""
+    client = program_client(
+        mock_anthropic,
+        ("tool", "search_course_content", {"query": "test"}),
+        ("text", "Context preserved response"),
+    )
+
+    mock_tool_manager.execute_tool.return_value = "Tool result"
+
+    result = ai_generator.generate_response(
+        "Test query",
+        conversation_history="Previous: User asked about X\nAssistant: Answered about X",
+        tools=tool_definitions,
+        tool_manager=mock_tool_manager
+    )
+
+    # Check that conversation history was included in the system blocks;
+    # same single-pass missing-list shape as the SYSTEM_PROMPT check below
+    first_call_args = client.messages.stream.call_args_list[0].kwargs
+    system_text = "".join(block["text"] for block in first_call_args['system'])
+    missing = [s for s in ("Previous conversation:", "User asked about X")
+               if s not in system_text]
+    assert not missing, f"missing from system blocks: {missing}"
+
+    # Check that final response includes the context
+    assert result == "Context preserved response"
+
+
+# Frozen at module load; checked in a single pass rather than one scan
+# (and one parametrized test case) per substring
+REQUIRED_PROMPT_SNIPPETS = (
+    # Sequential tool calling guidance
+    "Sequential tool use",
+    "Maximum 2 rounds of tool calls",
+    "Sequential Reasoning",
+    "After each tool use, evaluate if you need additional information",
+    "Use follow-up searches to gather complete context",
+    # Examples are provided
+    "get_course_outline → search_course_content → provide complete answer",
+)
+
+
+def test_system_prompt_sequential_instructions():
+    """Test that system prompt contains sequential tool calling instructions"""
+    missing = [s for s in REQUIRED_PROMPT_SNIPPETS
+               if s not in AIGenerator.SYSTEM_PROMPT]
+    assert not missing, f"missing from SYSTEM_PROMPT: {missing}"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, "-v"])
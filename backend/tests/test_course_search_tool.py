@@ -1,279 +1,243 @@
-import unittest
-import sys
-import os
-from unittest.mock import Mock, patch, MagicMock
-
-# Add parent directory to path to import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from search_tools import CourseSearchTool
-from vector_store import VectorStore, SearchResults
-from models import CourseChunk
-
-
-class TestCourseSearchTool(unittest.TestCase):
-    """Test cases for CourseSearchTool.execute() method"""
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        self.mock_vector_store = Mock(spec=VectorStore)
-        self.search_tool = CourseSearchTool(self.mock_vector_store)
-    
-    def test_execute_with_basic_query(self):
-        """Test execute method with a basic query"""
-        # Mock successful search results
-        mock_results = SearchResults(
-            documents=["This is test content from the course"],
-            metadata=[{
-                'course_title': 'Test Course',
-                'lesson_number': 1
-            }],
-            distances=[0.1],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        # Execute search
-        result = self.search_tool.execute("test query")
-        
-        # Verify vector store was called correctly
-        self.mock_vector_store.search.assert_called_once_with(
-            query="test query",
-            course_name=None,
-            lesson_number=None
-        )
-        
-        # Verify result formatting
-        self.assertIn("[Test Course - Lesson 1]", result)
-        self.assertIn("This is test content from the course", result)
-    
-    def test_execute_with_course_filter(self):
-        """Test execute method with course name filter"""
-        mock_results = SearchResults(
-            documents=["Content specific to MCP course"],
-            metadata=[{
-                'course_title': 'MCP Introduction',
-                'lesson_number': 2
-            }],
-            distances=[0.2],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("tools", course_name="MCP")
-        
-        # Verify correct parameters passed
-        self.mock_vector_store.search.assert_called_once_with(
-            query="tools",
-            course_name="MCP",
-            lesson_number=None
-        )
-        
-        self.assertIn("[MCP Introduction - Lesson 2]", result)
-    
-    def test_execute_with_lesson_filter(self):
-        """Test execute method with lesson number filter"""
-        mock_results = SearchResults(
-            documents=["Lesson 3 content"],
-            metadata=[{
-                'course_title': 'Advanced Course',
-                'lesson_number': 3
-            }],
-            distances=[0.3],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("advanced topics", lesson_number=3)
-        
-        self.mock_vector_store.search.assert_called_once_with(
-            query="advanced topics",
-            course_name=None,
-            lesson_number=3
-        )
-        
-        self.assertIn("[Advanced Course - Lesson 3]", result)
-    
-    def test_execute_with_both_filters(self):
-        """Test execute method with both course and lesson filters"""
-        mock_results = SearchResults(
-            documents=["Filtered content"],
-            metadata=[{
-                'course_title': 'Python Basics',
-                'lesson_number': 5
-            }],
-            distances=[0.15],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("variables", course_name="Python", lesson_number=5)
-        
-        self.mock_vector_store.search.assert_called_once_with(
-            query="variables",
-            course_name="Python",
-            lesson_number=5
-        )
-    
-    def test_execute_with_search_error(self):
-        """Test execute method handling search errors"""
-        mock_results = SearchResults(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error="Database connection failed"
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("test query")
-        
-        self.assertEqual(result, "Database connection failed")
-    
-    def test_execute_with_empty_results(self):
-        """Test execute method with no search results"""
-        mock_results = SearchResults(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("nonexistent topic")
-        
-        self.assertEqual(result, "No relevant content found.")
-    
-    def test_execute_with_empty_results_course_filter(self):
-        """Test execute method with no results and course filter"""
-        mock_results = SearchResults(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("nonexistent", course_name="Missing Course")
-        
-        self.assertEqual(result, "No relevant content found in course 'Missing Course'.")
-    
-    def test_execute_with_empty_results_lesson_filter(self):
-        """Test execute method with no results and lesson filter"""
-        mock_results = SearchResults(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("nonexistent", lesson_number=99)
-        
-        self.assertEqual(result, "No relevant content found in lesson 99.")
-    
-    def test_execute_with_multiple_results(self):
-        """Test execute method with multiple search results"""
-        mock_results = SearchResults(
-            documents=[
-                "First result content",
-                "Second result content"
-            ],
-            metadata=[
-                {'course_title': 'Course A', 'lesson_number': 1},
-                {'course_title': 'Course B', 'lesson_number': 2}
-            ],
-            distances=[0.1, 0.2],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        # Mock get_lesson_link calls
-        self.mock_vector_store.get_lesson_link.side_effect = [
-            "http://example.com/lesson1",
-            "http://example.com/lesson2"
-        ]
-        
-        result = self.search_tool.execute("test")
-        
-        # Check that both results are formatted
-        self.assertIn("[Course A - Lesson 1]", result)
-        self.assertIn("First result content", result)
-        self.assertIn("[Course B - Lesson 2]", result)
-        self.assertIn("Second result content", result)
-        
-        # Verify lesson link calls
-        self.mock_vector_store.get_lesson_link.assert_any_call('Course A', 1)
-        self.mock_vector_store.get_lesson_link.assert_any_call('Course B', 2)
-    
-    def test_execute_sources_tracking(self):
-        """Test that sources are correctly tracked"""
-        mock_results = SearchResults(
-            documents=["Test content"],
-            metadata=[{'course_title': 'Test Course', 'lesson_number': 1}],
-            distances=[0.1],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        self.mock_vector_store.get_lesson_link.return_value = "http://example.com/lesson"
-        
-        self.search_tool.execute("test")
-        
-        # Check that sources were stored
-        self.assertEqual(len(self.search_tool.last_sources), 1)
-        source = self.search_tool.last_sources[0]
-        self.assertEqual(source['text'], 'Test Course - Lesson 1')
-        self.assertEqual(source['link'], 'http://example.com/lesson')
-    
-    def test_execute_with_missing_metadata(self):
-        """Test execute method handling missing metadata"""
-        mock_results = SearchResults(
-            documents=["Content with missing metadata"],
-            metadata=[{}],  # Empty metadata
-            distances=[0.1],
-            error=None
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("test")
-        
-        # Should handle missing metadata gracefully
-        self.assertIn("[unknown]", result)
-        self.assertIn("Content with missing metadata", result)
-
-
-class TestCourseSearchToolIntegration(unittest.TestCase):
-    """Integration tests for CourseSearchTool with real vector store behavior"""
-    
-    def setUp(self):
-        """Set up integration test fixtures"""
-        # Create a real VectorStore instance but mock ChromaDB
-        with patch('chromadb.PersistentClient'), \
-             patch('chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction'):
-            self.vector_store = VectorStore("./test_db", "all-MiniLM-L6-v2", 5)
-            self.search_tool = CourseSearchTool(self.vector_store)
-    
-    @patch.object(VectorStore, 'search')
-    def test_integration_real_vector_store_call(self, mock_search):
-        """Test integration with real vector store method signatures"""
-        # Test that the actual vector store search method is called correctly
-        mock_search.return_value = SearchResults(
-            documents=["Integration test content"],
-            metadata=[{'course_title': 'Integration Course', 'lesson_number': 1}],
-            distances=[0.1],
-            error=None
-        )
-        
-        result = self.search_tool.execute("integration test", course_name="Test Course")
-        
-        # Verify the actual method signature matches
-        mock_search.assert_called_once_with(
-            query="integration test",
-            course_name="Test Course", 
-            lesson_number=None
-        )
-        
-        self.assertIn("Integration test content", result)
-
-
-if __name__ == '__main__':
+import copy
+import unittest
+
+import pytest
+from unittest.mock import create_autospec, patch
+
+# backend/ is on the import path via pythonpath in pyproject.toml
+from search_tools import CourseSearchTool
+from vector_store import VectorStore, SearchResults
+
+# SearchResults is read-only to the tool, so one empty instance serves
+# every no-results case instead of rebuilding the same object per test
+EMPTY_RESULTS = SearchResults(documents=[], metadata=[], distances=[], error=None)
+
+
+def make_result(doc, course, lesson, dist=0.1):
+    """Single-document SearchResults with the usual metadata shape"""
+    return SearchResults(
+        documents=[doc],
+        metadata=[{'course_title': course, 'lesson_number': lesson}],
+        distances=[dist],
+        error=None
+    )
+
+
+class TestCourseSearchTool(unittest.TestCase):
+    """Test cases for CourseSearchTool.execute() method"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Autospec VectorStore once; the signature analysis is the
+        expensive part, so each test copies this template instead.
+        Unlike a plain spec, autospec rejects bad call signatures at the
+        call site rather than leaving it to assert_called_once_with."""
+        cls._vs_template = create_autospec(VectorStore, instance=True)
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_vector_store = copy.copy(self._vs_template)
+        # Copies share lazily-created child mocks with the template, so
+        # wipe call history and configured values between tests
+        self.mock_vector_store.reset_mock(return_value=True, side_effect=True)
+        self.search_tool = CourseSearchTool(self.mock_vector_store)
+    
+    # (query, course_name, lesson_number, search result, exact formatted
+    # output) -- one row per filter combination. Exact equality also
+    # catches formatting regressions substring checks would miss.
+    FILTER_CASES = [
+        ("test query", None, None,
+         make_result("This is test content from the course", "Test Course", 1),
+         "[Test Course - Lesson 1]\nThis is test content from the course"),
+        ("tools", "MCP", None,
+         make_result("Content specific to MCP course", "MCP Introduction", 2),
+         "[MCP Introduction - Lesson 2]\nContent specific to MCP course"),
+        ("advanced topics", None, 3,
+         make_result("Lesson 3 content", "Advanced Course", 3),
+         "[Advanced Course - Lesson 3]\nLesson 3 content"),
+        ("variables", "Python", 5,
+         make_result("Filtered content", "Python Basics", 5),
+         "[Python Basics - Lesson 5]\nFiltered content"),
+    ]
+
+    def test_execute_filter_matrix(self):
+        """Test execute across the query/course/lesson filter combinations"""
+        for query, course_name, lesson_number, results, expected in self.FILTER_CASES:
+            with self.subTest(query=query, course_name=course_name,
+                              lesson_number=lesson_number):
+                self.mock_vector_store.reset_mock()
+                self.mock_vector_store.search.return_value = results
+
+                result = self.search_tool.execute(
+                    query, course_name=course_name, lesson_number=lesson_number
+                )
+
+                # Verify the filters were forwarded to the vector store
+                self.mock_vector_store.search.assert_called_once_with(
+                    query=query,
+                    course_name=course_name,
+                    lesson_number=lesson_number
+                )
+
+                # Verify the exact formatted output
+                self.assertEqual(result, expected)
+
+    def test_execute_with_search_error(self):
+        """Test execute method handling search errors"""
+        mock_results = SearchResults(
+            documents=[],
+            metadata=[],
+            distances=[],
+            error="Database connection failed"
+        )
+        self.mock_vector_store.search.return_value = mock_results
+        
+        result = self.search_tool.execute("test query")
+        
+        self.assertEqual(result, "Database connection failed")
+    
+    # (course_name, lesson_number, expected message) for empty results
+    EMPTY_RESULT_CASES = [
+        (None, None, "No relevant content found."),
+        ("Missing Course", None,
+         "No relevant content found in course 'Missing Course'."),
+        (None, 99, "No relevant content found in lesson 99."),
+    ]
+
+    def test_execute_empty_results_matrix(self):
+        """Test the empty-result message for each filter combination"""
+        self.mock_vector_store.search.return_value = EMPTY_RESULTS
+
+        for course_name, lesson_number, expected in self.EMPTY_RESULT_CASES:
+            with self.subTest(course_name=course_name, lesson_number=lesson_number):
+                result = self.search_tool.execute(
+                    "nonexistent", course_name=course_name, lesson_number=lesson_number
+                )
+                self.assertEqual(result, expected)
+
+    def test_execute_with_multiple_results(self):
+        """Test execute method with multiple search results"""
+        mock_results = SearchResults(
+            documents=[
+                "First result content",
+                "Second result content"
+            ],
+            metadata=[
+                {'course_title': 'Course A', 'lesson_number': 1},
+                {'course_title': 'Course B', 'lesson_number': 2}
+            ],
+            distances=[0.1, 0.2],
+            error=None
+        )
+        self.mock_vector_store.search.return_value = mock_results
+        
+        # Mock get_lesson_link calls
+        self.mock_vector_store.get_lesson_link.side_effect = [
+            "http://example.com/lesson1",
+            "http://example.com/lesson2"
+        ]
+        
+        result = self.search_tool.execute("test")
+
+        # Check the exact formatting of both results
+        self.assertEqual(
+            result,
+            "[Course A - Lesson 1]\nFirst result content\n\n"
+            "[Course B - Lesson 2]\nSecond result content"
+        )
+
+        # Verify lesson link calls
+        self.mock_vector_store.get_lesson_link.assert_any_call('Course A', 1)
+        self.mock_vector_store.get_lesson_link.assert_any_call('Course B', 2)
+    
+    def test_execute_sources_tracking(self):
+        """Test that sources are correctly tracked"""
+        self.mock_vector_store.search.return_value = make_result(
+            "Test content", "Test Course", 1
+        )
+        self.mock_vector_store.get_lesson_link.return_value = "http://example.com/lesson"
+        
+        self.search_tool.execute("test")
+        
+        # Check that sources were stored
+        self.assertEqual(len(self.search_tool.last_sources), 1)
+        source = self.search_tool.last_sources[0]
+        self.assertEqual(source['text'], 'Test Course - Lesson 1')
+        self.assertEqual(source['link'], 'http://example.com/lesson')
+    
+    def test_execute_with_missing_metadata(self):
+        """Test execute method handling missing metadata"""
+        mock_results = SearchResults(
+            documents=["Content with missing metadata"],
+            metadata=[{}],  # Empty metadata
+            distances=[0.1],
+            error=None
+        )
+        self.mock_vector_store.search.return_value = mock_results
+        
+        result = self.search_tool.execute("test")
+
+        # Should handle missing metadata gracefully
+        self.assertEqual(result, "[unknown]\nContent with missing metadata")
+
+
+@pytest.mark.integration
+class TestCourseSearchToolIntegration(unittest.TestCase):
+    """Integration tests for CourseSearchTool with real vector store behavior.
+
+    Deselected by default (addopts carries -m "not integration"); run with
+    `pytest -m integration` to include it. The execute() path it covers is
+    already asserted exhaustively above -- this class only adds a real
+    VectorStore against patched ChromaDB, so skipping it saves the class-level
+    patcher start/stop and one duplicate test body. (It does not avoid the
+    chromadb import itself: the module-top vector_store import pulls that in
+    at collection regardless.)
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        """Patch ChromaDB once for the class instead of per test; each
+        patch start/stop pays descriptor lookup and restoration cost"""
+        cls._chroma_patchers = [
+            patch('chromadb.PersistentClient'),
+            patch('chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction'),
+        ]
+        for patcher in cls._chroma_patchers:
+            patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patcher in cls._chroma_patchers:
+            patcher.stop()
+
+    def setUp(self):
+        """Set up integration test fixtures"""
+        # Create a real VectorStore instance against the patched ChromaDB
+        self.vector_store = VectorStore("./test_db", "all-MiniLM-L6-v2", 5)
+        self.search_tool = CourseSearchTool(self.vector_store)
+    
+    @patch.object(VectorStore, 'search')
+    def test_integration_real_vector_store_call(self, mock_search):
+        """Test integration with real vector store method signatures"""
+        # Test that the actual vector store search method is called correctly
+        mock_search.return_value = SearchResults(
+            documents=["Integration test content"],
+            metadata=[{'course_title': 'Integration Course', 'lesson_number': 1}],
+            distances=[0.1],
+            error=None
+        )
+        
+        result = self.search_tool.execute("integration test", course_name="Test Course")
+        
+        # Verify the actual method signature matches
+        mock_search.assert_called_once_with(
+            query="integration test",
+            course_name="Test Course", 
+            lesson_number=None
+        )
+        
+        self.assertIn("Integration test content", result)
+
+
+if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -1,255 +1,257 @@
-import unittest
-import sys
-import os
-from unittest.mock import Mock, patch, MagicMock
-
-# Add parent directory to path to import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from rag_system import RAGSystem
-from config import Config
-
-
-class TestSequentialToolCallingIntegration(unittest.TestCase):
-    """Integration tests for sequential tool calling with RAG system"""
-    
-    def setUp(self):
-        """Set up integration test fixtures"""
-        # Create mock config
-        self.mock_config = Mock(spec=Config)
-        self.mock_config.CHUNK_SIZE = 800
-        self.mock_config.CHUNK_OVERLAP = 100
-        self.mock_config.CHROMA_PATH = "./test_db"
-        self.mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        self.mock_config.MAX_RESULTS = 5
-        self.mock_config.ANTHROPIC_API_KEY = "test_key"
-        self.mock_config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-        self.mock_config.MAX_HISTORY = 2
-        
-        # Mock the anthropic client to prevent real API calls
-        self.anthropic_patcher = patch('ai_generator.anthropic.Anthropic')
-        self.mock_anthropic_class = self.anthropic_patcher.start()
-        self.mock_client = Mock()
-        self.mock_anthropic_class.return_value = self.mock_client
-        
-    def tearDown(self):
-        """Clean up patches"""
-        self.anthropic_patcher.stop()
-    
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.SessionManager')
-    def test_rag_system_with_sequential_tools(self, mock_session_mgr_class, 
-                                              mock_vector_store_class, mock_doc_proc_class):
-        """Test that RAG system supports sequential tool calling"""
-        
-        # Set up mock dependencies
-        mock_vector_store = Mock()
-        mock_session_manager = Mock()
-        
-        mock_vector_store_class.return_value = mock_vector_store
-        mock_session_mgr_class.return_value = mock_session_manager
-        mock_doc_proc_class.return_value = Mock()
-        
-        # Create RAG system
-        rag_system = RAGSystem(self.mock_config)
-        
-        # Mock sequential tool calling scenario
-        # Round 1: Get course outline
-        mock_tool_use_1 = Mock()
-        mock_tool_use_1.type = "tool_use"
-        mock_tool_use_1.name = "get_course_outline"
-        mock_tool_use_1.id = "tool_1"
-        mock_tool_use_1.input = {"course_title": "MCP"}
-        
-        mock_response_1 = Mock()
-        mock_response_1.content = [mock_tool_use_1]
-        mock_response_1.stop_reason = "tool_use"
-        
-        # Round 2: Search course content based on outline
-        mock_tool_use_2 = Mock()
-        mock_tool_use_2.type = "tool_use"
-        mock_tool_use_2.name = "search_course_content"
-        mock_tool_use_2.id = "tool_2"
-        mock_tool_use_2.input = {"query": "lesson 4 content", "course_name": "MCP"}
-        
-        mock_response_2 = Mock()
-        mock_response_2.content = [mock_tool_use_2]
-        mock_response_2.stop_reason = "tool_use"
-        
-        # Final response
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock()]
-        mock_final_response.content[0].text = "MCP Lesson 4 covers advanced features including custom tools and protocols"
-        
-        # Set up API call sequence
-        self.mock_client.messages.create.side_effect = [
-            mock_response_1,
-            mock_response_2,
-            mock_final_response
-        ]
-        
-        # Mock tool manager behavior
-        with patch.object(rag_system.tool_manager, 'get_tool_definitions') as mock_get_tools, \
-             patch.object(rag_system.tool_manager, 'execute_tool') as mock_execute_tool, \
-             patch.object(rag_system.tool_manager, 'get_last_sources') as mock_get_sources, \
-             patch.object(rag_system.tool_manager, 'reset_sources') as mock_reset_sources:
-            
-            # Mock tool definitions
-            mock_get_tools.return_value = [
-                {"name": "get_course_outline", "description": "Get course outline"},
-                {"name": "search_course_content", "description": "Search course content"}
-            ]
-            
-            # Mock tool executions
-            mock_execute_tool.side_effect = [
-                "MCP Course Outline:\nLesson 1: Introduction\nLesson 2: Basic Setup\nLesson 3: Simple Tools\nLesson 4: Advanced Features",
-                "Lesson 4 content: Advanced MCP features include custom tool development, protocol extensions, and integration patterns"
-            ]
-            
-            # Mock sources
-            mock_get_sources.return_value = [
-                {"text": "MCP Course - Lesson 4", "link": "http://example.com/mcp/lesson4"}
-            ]
-            
-            # Mock session manager
-            mock_session_manager.get_conversation_history.return_value = None
-            
-            # Execute query that should trigger sequential tool calling
-            response, sources = rag_system.query("What does lesson 4 of MCP course cover?")
-            
-            # Verify the response
-            self.assertIn("advanced features", response.lower())
-            self.assertIn("custom tools", response.lower())
-            
-            # Verify sources were retrieved
-            self.assertEqual(len(sources), 1)
-            self.assertEqual(sources[0]["text"], "MCP Course - Lesson 4")
-            
-            # Verify sequential tool calls were made
-            self.assertEqual(mock_execute_tool.call_count, 2)
-            
-            # Check the sequence of tool calls
-            tool_calls = mock_execute_tool.call_args_list
-            self.assertEqual(tool_calls[0][0], ("get_course_outline",))
-            self.assertEqual(tool_calls[1][0], ("search_course_content",))
-            
-            # Verify multiple API calls were made (sequential rounds)
-            self.assertEqual(self.mock_client.messages.create.call_count, 3)
-            
-            # Verify tools were available in each round
-            for call_args in self.mock_client.messages.create.call_args_list[:-1]:  # Exclude final call
-                self.assertIn('tools', call_args[1])
-                tools = call_args[1]['tools']
-                self.assertTrue(len(tools) > 0)
-    
-    def test_sequential_tool_calling_preserves_max_rounds(self):
-        """Test that sequential tool calling respects configured max rounds"""
-        
-        # Test that the default max_rounds parameter (2) is preserved
-        # when passed through the RAG system to AI generator
-        
-        with patch('rag_system.DocumentProcessor'), \
-             patch('rag_system.VectorStore') as mock_vector_store_class, \
-             patch('rag_system.SessionManager') as mock_session_mgr_class:
-            
-            mock_vector_store_class.return_value = Mock()
-            mock_session_mgr_class.return_value = Mock()
-            
-            rag_system = RAGSystem(self.mock_config)
-            
-            # Mock a scenario that would exceed max rounds
-            mock_responses = []
-            for i in range(5):  # More responses than max_rounds
-                mock_tool_use = Mock()
-                mock_tool_use.type = "tool_use"
-                mock_tool_use.name = "search_course_content"
-                mock_tool_use.id = f"tool_{i}"
-                mock_tool_use.input = {"query": f"search_{i}"}
-                
-                mock_response = Mock()
-                mock_response.content = [mock_tool_use]
-                mock_response.stop_reason = "tool_use"
-                mock_responses.append(mock_response)
-            
-            # Final response
-            mock_final_response = Mock()
-            mock_final_response.content = [Mock()]
-            mock_final_response.content[0].text = "Final response after max rounds"
-            mock_responses.append(mock_final_response)
-            
-            self.mock_client.messages.create.side_effect = mock_responses
-            
-            # Mock tool manager
-            with patch.object(rag_system.tool_manager, 'get_tool_definitions') as mock_get_tools, \
-                 patch.object(rag_system.tool_manager, 'execute_tool') as mock_execute_tool, \
-                 patch.object(rag_system.tool_manager, 'get_last_sources') as mock_get_sources, \
-                 patch.object(rag_system.tool_manager, 'reset_sources'):
-                
-                mock_get_tools.return_value = [{"name": "search_course_content"}]
-                mock_execute_tool.return_value = "Search result"
-                mock_get_sources.return_value = []
-                
-                # Execute query
-                response, sources = rag_system.query("Complex multi-step query")
-                
-                # Should stop after max_rounds (2) + final call = 3 API calls maximum
-                self.assertLessEqual(self.mock_client.messages.create.call_count, 3)
-                
-                # Should execute at most 2 tool calls (max_rounds)
-                self.assertLessEqual(mock_execute_tool.call_count, 2)
-    
-    def test_backward_compatibility_single_tool_call(self):
-        """Test that single tool calls still work (backward compatibility)"""
-        
-        with patch('rag_system.DocumentProcessor'), \
-             patch('rag_system.VectorStore') as mock_vector_store_class, \
-             patch('rag_system.SessionManager') as mock_session_mgr_class:
-            
-            mock_vector_store_class.return_value = Mock()
-            mock_session_mgr_class.return_value = Mock()
-            
-            rag_system = RAGSystem(self.mock_config)
-            
-            # Mock single tool call scenario (like before)
-            mock_tool_use = Mock()
-            mock_tool_use.type = "tool_use"
-            mock_tool_use.name = "search_course_content"
-            mock_tool_use.id = "tool_1"
-            mock_tool_use.input = {"query": "Python basics"}
-            
-            mock_response_1 = Mock()
-            mock_response_1.content = [mock_tool_use]
-            mock_response_1.stop_reason = "tool_use"
-            
-            # Claude decides no more tools needed
-            mock_final_response = Mock()
-            mock_final_response.content = [Mock()]
-            mock_final_response.content[0].text = "Python is a programming language"
-            mock_final_response.stop_reason = "end_turn"
-            
-            self.mock_client.messages.create.side_effect = [
-                mock_response_1,
-                mock_final_response
-            ]
-            
-            with patch.object(rag_system.tool_manager, 'get_tool_definitions') as mock_get_tools, \
-                 patch.object(rag_system.tool_manager, 'execute_tool') as mock_execute_tool, \
-                 patch.object(rag_system.tool_manager, 'get_last_sources') as mock_get_sources, \
-                 patch.object(rag_system.tool_manager, 'reset_sources'):
-                
-                mock_get_tools.return_value = [{"name": "search_course_content"}]
-                mock_execute_tool.return_value = "Python content"
-                mock_get_sources.return_value = [{"text": "Python Course", "link": None}]
-                
-                response, sources = rag_system.query("What is Python?")
-                
-                # Should work exactly like before
-                self.assertEqual(response, "Python is a programming language")
-                self.assertEqual(len(sources), 1)
-                self.assertEqual(mock_execute_tool.call_count, 1)
-                self.assertEqual(self.mock_client.messages.create.call_count, 2)
-
-
-if __name__ == '__main__':
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch, MagicMock
+
+# backend/ is on the import path via pythonpath in pyproject.toml
+from rag_system import RAGSystem
+
+# Invariant tool results, interned once at import instead of being
+# rebuilt inside the scenarios table on every test execution
+_MCP_OUTLINE = (
+    "MCP Course Outline:\nLesson 1: Introduction\nLesson 2: Basic Setup\n"
+    "Lesson 3: Simple Tools\nLesson 4: Advanced Features"
+)
+_MCP_LESSON4 = (
+    "Lesson 4 content: Advanced MCP features include custom tool development, "
+    "protocol extensions, and integration patterns"
+)
+
+# The code under test only reads plain attributes off these objects, so
+# SimpleNamespace stands in for the API response types without Mock's
+# per-attribute __getattr__ machinery (and without the name= quirk)
+
+
+def make_tool_use(name, tool_id, tool_input):
+    """Tool-use content block with the attributes the tool loop reads"""
+    return SimpleNamespace(type="tool_use", name=name, id=tool_id,
+                           input=tool_input)
+
+
+def make_tool_response(tool_use):
+    """Tool-use-round API response around one content block"""
+    return SimpleNamespace(stop_reason="tool_use", content=[tool_use])
+
+
+def make_final_response(text):
+    """End-of-loop API response around one text block"""
+    return SimpleNamespace(stop_reason="end_turn",
+                           content=[SimpleNamespace(text=text)])
+
+
+def make_stream(response):
+    """Build a mock streaming context manager that resolves to the given message"""
+    stream = Mock()
+    stream.text_stream = []
+    stream.get_final_message.return_value = response
+    manager = MagicMock()
+    manager.__enter__.return_value = stream
+    return manager
+
+
+class TestSequentialToolCallingIntegration(unittest.TestCase):
+    """Integration tests for sequential tool calling with RAG system"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Build the shared test config once; the tests only read plain
+        attributes off it, so a SimpleNamespace stands in for Config
+        without any spec introspection"""
+        cls._config_template = SimpleNamespace(
+            CHUNK_SIZE=800,
+            CHUNK_OVERLAP=100,
+            CHROMA_PATH="./test_db",
+            EMBEDDING_MODEL="all-MiniLM-L6-v2",
+            MAX_RESULTS=5,
+            ANTHROPIC_API_KEY="test_key",
+            ANTHROPIC_MODEL="claude-sonnet-4-20250514",
+            MAX_HISTORY=2,
+        )
+
+        # Patch the Anthropic constructor once for the class; per-test
+        # start/stop of the same patch was pure overhead
+        cls._anthropic_patcher = patch('ai_generator.anthropic.Anthropic')
+        cls._mock_anthropic_class = cls._anthropic_patcher.start()
+
+        # Assemble one RAGSystem for the class via __new__: query() only
+        # touches ai_generator, session_manager, and tool_manager, so
+        # skipping __init__ avoids constructing (even mocked) document
+        # processor and vector store dependencies entirely
+        from ai_generator import AIGenerator
+        cls._rag_system = RAGSystem.__new__(RAGSystem)
+        cls._rag_system.config = cls._config_template
+        cls._rag_system.ai_generator = AIGenerator(
+            cls._config_template.ANTHROPIC_API_KEY,
+            cls._config_template.ANTHROPIC_MODEL,
+        )
+        cls._rag_system.session_manager = Mock()
+        cls._rag_system.tool_manager = Mock()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._anthropic_patcher.stop()
+
+    def setUp(self):
+        """Set up integration test fixtures"""
+        # Drop any shared client left over from other tests so the patched
+        # class below is the one that gets instantiated
+        from ai_generator import AIGenerator
+        AIGenerator._shared_client = None
+
+        # Fresh client per test so stream call counts and side_effect
+        # queues never bleed between tests
+        self.mock_client = Mock()
+        self._mock_anthropic_class.return_value = self.mock_client
+
+        # Shared RAGSystem: clear per-instance caches and the session
+        # manager's recorded calls between tests
+        self.rag_system = self._rag_system
+        self.rag_system.ai_generator._response_cache.clear()
+        self.rag_system.ai_generator._prepared_tools.clear()
+        self.rag_system.session_manager.reset_mock()
+
+    def _stub_tool_manager(self, definitions, execute=None, sources=None):
+        """Point the shared tool manager at fresh mocks for this test"""
+        tool_manager = self.rag_system.tool_manager
+        tool_manager.get_tool_definitions = Mock(return_value=definitions)
+        tool_manager.execute_tool = Mock()
+        if execute is not None:
+            if isinstance(execute, list):
+                tool_manager.execute_tool.side_effect = execute
+            else:
+                tool_manager.execute_tool.return_value = execute
+        tool_manager.get_last_sources = Mock(return_value=sources or [])
+        tool_manager.reset_sources = Mock()
+        return tool_manager
+    
+    def _fresh_client(self):
+        """Install a new mock client so call counts reset per scenario"""
+        from ai_generator import AIGenerator
+        AIGenerator._shared_client = None
+        self.mock_client = Mock()
+        self._mock_anthropic_class.return_value = self.mock_client
+        return self.mock_client
+
+    def test_query_tool_sequences(self):
+        """Drive query() through sequential, over-limit, and single tool flows.
+
+        One driver replaces three near-identical tests; each scenario row
+        supplies the programmed responses and only the assertions that
+        apply to it (absent keys skip the check).
+        """
+        scenarios = [
+            dict(
+                name="sequential-two-rounds",
+                query="What does lesson 4 of MCP course cover?",
+                responses=[
+                    make_tool_response(make_tool_use(
+                        "get_course_outline", "tool_1", {"course_title": "MCP"})),
+                    make_tool_response(make_tool_use(
+                        "search_course_content", "tool_2",
+                        {"query": "lesson 4 content", "course_name": "MCP"})),
+                    make_final_response(
+                        "MCP Lesson 4 covers advanced features including custom tools and protocols"),
+                ],
+                definitions=[
+                    {"name": "get_course_outline", "description": "Get course outline"},
+                    {"name": "search_course_content", "description": "Search course content"}
+                ],
+                execute=[_MCP_OUTLINE, _MCP_LESSON4],
+                sources=[{"text": "MCP Course - Lesson 4",
+                          "link": "http://example.com/mcp/lesson4"}],
+                response_substrings=["advanced features", "custom tools"],
+                source_texts=["MCP Course - Lesson 4"],
+                api_calls=3,
+                tool_calls=2,
+                tool_order=["get_course_outline", "search_course_content"],
+                tools_in_rounds=True,
+            ),
+            dict(
+                # More tool rounds queued than max_rounds (2) allows; the
+                # loop must cap at two rounds plus the final synthesis call,
+                # leaving the surplus tool responses unconsumed
+                name="max-rounds-capped",
+                query="Complex multi-step query",
+                responses=[
+                    make_tool_response(make_tool_use(
+                        "search_course_content", "tool_0", {"query": "search_0"})),
+                    make_tool_response(make_tool_use(
+                        "search_course_content", "tool_1", {"query": "search_1"})),
+                    make_final_response("Final response after max rounds"),
+                ] + [
+                    make_tool_response(make_tool_use(
+                        "search_course_content", f"tool_{i}", {"query": f"search_{i}"}))
+                    for i in range(2, 5)
+                ],
+                definitions=[{"name": "search_course_content"}],
+                execute="Search result",
+                max_api_calls=3,
+                max_tool_calls=2,
+            ),
+            dict(
+                # Single tool call followed by end_turn (backward compatibility)
+                name="single-tool-call",
+                query="What is Python?",
+                responses=[
+                    make_tool_response(make_tool_use(
+                        "search_course_content", "tool_1", {"query": "Python basics"})),
+                    make_final_response("Python is a programming language"),
+                ],
+                definitions=[{"name": "search_course_content"}],
+                execute="Python content",
+                sources=[{"text": "Python Course", "link": None}],
+                response_text="Python is a programming language",
+                source_texts=["Python Course"],
+                api_calls=2,
+                tool_calls=1,
+            ),
+        ]
+
+        for case in scenarios:
+            with self.subTest(case=case["name"]):
+                client = self._fresh_client()
+                client.messages.stream.side_effect = [
+                    make_stream(r) for r in case["responses"]
+                ]
+                tool_manager = self._stub_tool_manager(
+                    definitions=case["definitions"],
+                    execute=case["execute"],
+                    sources=case.get("sources"),
+                )
+                self.rag_system.session_manager.get_conversation_history.return_value = None
+                self.rag_system.ai_generator._response_cache.clear()
+
+                response, sources = self.rag_system.query(case["query"])
+
+                if "response_text" in case:
+                    self.assertEqual(response, case["response_text"])
+                for needle in case.get("response_substrings", ()):
+                    self.assertIn(needle, response.lower())
+                if "source_texts" in case:
+                    self.assertEqual([s["text"] for s in sources],
+                                     case["source_texts"])
+
+                stream_count = client.messages.stream.call_count
+                if "api_calls" in case:
+                    self.assertEqual(stream_count, case["api_calls"])
+                if "max_api_calls" in case:
+                    self.assertLessEqual(stream_count, case["max_api_calls"])
+
+                tool_count = tool_manager.execute_tool.call_count
+                if "tool_calls" in case:
+                    self.assertEqual(tool_count, case["tool_calls"])
+                if "max_tool_calls" in case:
+                    self.assertLessEqual(tool_count, case["max_tool_calls"])
+                if "tool_order" in case:
+                    calls = tool_manager.execute_tool.call_args_list
+                    self.assertEqual([c.args for c in calls],
+                                     [(name,) for name in case["tool_order"]])
+
+                # Tools must be offered in every round before the final call
+                if case.get("tools_in_rounds"):
+                    stream_calls = list(client.messages.stream.call_args_list)
+                    for call_args in stream_calls[:-1]:
+                        self.assertTrue(call_args.kwargs['tools'])
+
+
+if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -1,326 +1,366 @@
-import unittest
-import sys
-import os
-from unittest.mock import Mock, patch, MagicMock
-
-# Add parent directory to path to import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from rag_system import RAGSystem
-from config import Config
-from ai_generator import AIGenerator
-from search_tools import ToolManager, CourseSearchTool
-from vector_store import VectorStore
-from session_manager import SessionManager
-
-
-class TestRAGSystemQuery(unittest.TestCase):
-    """Test cases for RAG system query handling"""
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        # Create a mock config
-        self.mock_config = Mock(spec=Config)
-        self.mock_config.CHUNK_SIZE = 800
-        self.mock_config.CHUNK_OVERLAP = 100
-        self.mock_config.CHROMA_PATH = "./test_db"
-        self.mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        self.mock_config.MAX_RESULTS = 5
-        self.mock_config.ANTHROPIC_API_KEY = "test_key"
-        self.mock_config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-        self.mock_config.MAX_HISTORY = 2
-        
-        # Mock all the dependencies
-        with patch('rag_system.DocumentProcessor'), \
-             patch('rag_system.VectorStore') as mock_vector_store_class, \
-             patch('rag_system.AIGenerator') as mock_ai_generator_class, \
-             patch('rag_system.SessionManager') as mock_session_manager_class, \
-             patch('rag_system.ToolManager') as mock_tool_manager_class, \
-             patch('rag_system.CourseSearchTool') as mock_search_tool_class, \
-             patch('rag_system.CourseOutlineTool') as mock_outline_tool_class:
-            
-            # Create mock instances
-            self.mock_vector_store = Mock(spec=VectorStore)
-            self.mock_ai_generator = Mock(spec=AIGenerator)
-            self.mock_session_manager = Mock(spec=SessionManager)
-            self.mock_tool_manager = Mock(spec=ToolManager)
-            self.mock_search_tool = Mock(spec=CourseSearchTool)
-            
-            # Configure mock classes to return mock instances
-            mock_vector_store_class.return_value = self.mock_vector_store
-            mock_ai_generator_class.return_value = self.mock_ai_generator
-            mock_session_manager_class.return_value = self.mock_session_manager
-            mock_tool_manager_class.return_value = self.mock_tool_manager
-            mock_search_tool_class.return_value = self.mock_search_tool
-            
-            # Create RAG system
-            self.rag_system = RAGSystem(self.mock_config)
-    
-    def test_query_basic_functionality(self):
-        """Test basic query processing"""
-        # Mock AI response
-        self.mock_ai_generator.generate_response.return_value = "This is the AI response"
-        
-        # Mock tool manager sources
-        self.mock_tool_manager.get_last_sources.return_value = [
-            {"text": "Test Course - Lesson 1", "link": "http://example.com"}
-        ]
-        
-        # Execute query
-        response, sources = self.rag_system.query("What is MCP?")
-        
-        # Verify AI generator was called correctly
-        self.mock_ai_generator.generate_response.assert_called_once()
-        call_args = self.mock_ai_generator.generate_response.call_args[1]
-        
-        # Check query was formatted correctly
-        expected_query = "Answer this question about course materials: What is MCP?"
-        self.assertEqual(call_args['query'], expected_query)
-        
-        # Check tools and tool manager were provided
-        self.assertEqual(call_args['tool_manager'], self.mock_tool_manager)
-        self.assertIsNotNone(call_args['tools'])
-        
-        # Check no conversation history was passed
-        self.assertIsNone(call_args['conversation_history'])
-        
-        # Verify sources were retrieved and reset
-        self.mock_tool_manager.get_last_sources.assert_called_once()
-        self.mock_tool_manager.reset_sources.assert_called_once()
-        
-        # Check return values
-        self.assertEqual(response, "This is the AI response")
-        self.assertEqual(sources, [{"text": "Test Course - Lesson 1", "link": "http://example.com"}])
-    
-    def test_query_with_session_id(self):
-        """Test query processing with session management"""
-        session_id = "test_session_123"
-        
-        # Mock session history
-        mock_history = "User: Previous question\nAssistant: Previous answer"
-        self.mock_session_manager.get_conversation_history.return_value = mock_history
-        
-        # Mock AI response
-        self.mock_ai_generator.generate_response.return_value = "Response with context"
-        self.mock_tool_manager.get_last_sources.return_value = []
-        
-        # Execute query with session
-        response, sources = self.rag_system.query("Follow up question", session_id)
-        
-        # Verify session history was retrieved
-        self.mock_session_manager.get_conversation_history.assert_called_once_with(session_id)
-        
-        # Verify history was passed to AI generator
-        call_args = self.mock_ai_generator.generate_response.call_args[1]
-        self.assertEqual(call_args['conversation_history'], mock_history)
-        
-        # Verify session was updated with new exchange
-        self.mock_session_manager.add_exchange.assert_called_once_with(
-            session_id, "Follow up question", "Response with context"
-        )
-    
-    def test_query_tool_manager_integration(self):
-        """Test that tool manager is properly configured"""
-        # Mock AI response and sources
-        self.mock_ai_generator.generate_response.return_value = "Tool-assisted response"
-        self.mock_tool_manager.get_last_sources.return_value = []
-        
-        # Mock tool definitions
-        mock_tool_definitions = [
-            {"name": "search_course_content", "description": "Search content"},
-            {"name": "get_course_outline", "description": "Get outline"}
-        ]
-        self.mock_tool_manager.get_tool_definitions.return_value = mock_tool_definitions
-        
-        # Execute query
-        response, sources = self.rag_system.query("Test tool integration")
-        
-        # Verify tool definitions were retrieved and passed
-        self.mock_tool_manager.get_tool_definitions.assert_called_once()
-        call_args = self.mock_ai_generator.generate_response.call_args[1]
-        self.assertEqual(call_args['tools'], mock_tool_definitions)
-    
-    def test_query_error_handling(self):
-        """Test query error handling"""
-        # Mock AI generator to raise an exception
-        self.mock_ai_generator.generate_response.side_effect = Exception("AI API error")
-        
-        # Query should raise the exception (not handle it internally)
-        with self.assertRaises(Exception) as context:
-            self.rag_system.query("Error test")
-        
-        self.assertIn("AI API error", str(context.exception))
-    
-    def test_query_sources_handling(self):
-        """Test proper sources handling"""
-        # Mock different types of sources
-        mock_sources = [
-            {"text": "Course A - Lesson 1", "link": "http://example.com/lesson1"},
-            {"text": "Course B - Lesson 2", "link": None},  # No link
-            "Simple string source"  # Backward compatibility
-        ]
-        
-        self.mock_ai_generator.generate_response.return_value = "Response"
-        self.mock_tool_manager.get_last_sources.return_value = mock_sources
-        
-        response, sources = self.rag_system.query("Source test")
-        
-        # Verify sources are passed through unchanged
-        self.assertEqual(sources, mock_sources)
-        
-        # Verify sources were reset after retrieval
-        self.mock_tool_manager.reset_sources.assert_called_once()
-    
-    def test_query_prompt_formatting(self):
-        """Test that query is properly formatted for AI"""
-        self.mock_ai_generator.generate_response.return_value = "Response"
-        self.mock_tool_manager.get_last_sources.return_value = []
-        
-        test_query = "How do I use MCP tools?"
-        self.rag_system.query(test_query)
-        
-        # Verify query was formatted with instruction prefix
-        call_args = self.mock_ai_generator.generate_response.call_args[1]
-        expected_prompt = f"Answer this question about course materials: {test_query}"
-        self.assertEqual(call_args['query'], expected_prompt)
-    
-    def test_initialization_tool_registration(self):
-        """Test that tools are properly registered during initialization"""
-        # This tests the __init__ method behavior
-        
-        # Verify tools were registered
-        self.mock_tool_manager.register_tool.assert_any_call(self.mock_search_tool)
-        self.assertEqual(self.mock_tool_manager.register_tool.call_count, 2)  # search + outline tools
-
-
-class TestRAGSystemIntegration(unittest.TestCase):
-    """Integration tests for RAG system components"""
-    
-    def setUp(self):
-        """Set up integration test fixtures"""
-        self.mock_config = Mock(spec=Config)
-        self.mock_config.CHUNK_SIZE = 800
-        self.mock_config.CHUNK_OVERLAP = 100
-        self.mock_config.CHROMA_PATH = "./test_db"
-        self.mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        self.mock_config.MAX_RESULTS = 5
-        self.mock_config.ANTHROPIC_API_KEY = "test_key"
-        self.mock_config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-        self.mock_config.MAX_HISTORY = 2
-    
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.SessionManager')
-    def test_end_to_end_query_flow(self, mock_session_mgr_class, mock_ai_gen_class, 
-                                   mock_vector_store_class, mock_doc_proc_class):
-        """Test complete end-to-end query processing"""
-        # Create real instances with mocked behavior
-        mock_vector_store = Mock()
-        mock_ai_generator = Mock()
-        mock_session_manager = Mock()
-        
-        mock_vector_store_class.return_value = mock_vector_store
-        mock_ai_gen_class.return_value = mock_ai_generator
-        mock_session_mgr_class.return_value = mock_session_manager
-        
-        # Create RAG system
-        rag_system = RAGSystem(self.mock_config)
-        
-        # Mock the complete flow
-        mock_session_manager.get_conversation_history.return_value = None
-        mock_ai_generator.generate_response.return_value = "MCP is Model Context Protocol"
-        
-        # Mock tool manager behavior
-        with patch.object(rag_system.tool_manager, 'get_tool_definitions') as mock_get_tools, \
-             patch.object(rag_system.tool_manager, 'get_last_sources') as mock_get_sources, \
-             patch.object(rag_system.tool_manager, 'reset_sources') as mock_reset_sources:
-            
-            mock_get_tools.return_value = [{"name": "search_course_content"}]
-            mock_get_sources.return_value = [{"text": "MCP Course", "link": None}]
-            
-            # Execute query
-            response, sources = rag_system.query("What is MCP?")
-            
-            # Verify the complete flow
-            self.assertEqual(response, "MCP is Model Context Protocol")
-            self.assertEqual(sources, [{"text": "MCP Course", "link": None}])
-            
-            # Verify all components were called
-            mock_ai_generator.generate_response.assert_called_once()
-            mock_get_sources.assert_called_once()
-            mock_reset_sources.assert_called_once()
-
-
-class TestRAGSystemFailureScenarios(unittest.TestCase):
-    """Test various failure scenarios in RAG system"""
-    
-    def setUp(self):
-        """Set up failure scenario test fixtures"""
-        self.mock_config = Mock(spec=Config)
-        self.mock_config.CHUNK_SIZE = 800
-        self.mock_config.CHUNK_OVERLAP = 100
-        self.mock_config.CHROMA_PATH = "./test_db"
-        self.mock_config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-        self.mock_config.MAX_RESULTS = 5
-        self.mock_config.ANTHROPIC_API_KEY = "test_key"
-        self.mock_config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-        self.mock_config.MAX_HISTORY = 2
-    
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.SessionManager')
-    def test_ai_generator_failure(self, mock_session_mgr_class, mock_ai_gen_class,
-                                  mock_vector_store_class, mock_doc_proc_class):
-        """Test behavior when AI generator fails"""
-        mock_ai_generator = Mock()
-        mock_ai_gen_class.return_value = mock_ai_generator
-        
-        # Mock other components
-        mock_vector_store_class.return_value = Mock()
-        mock_session_mgr_class.return_value = Mock()
-        mock_doc_proc_class.return_value = Mock()
-        
-        rag_system = RAGSystem(self.mock_config)
-        
-        # Mock AI generator failure
-        mock_ai_generator.generate_response.side_effect = Exception("API key invalid")
-        
-        # Query should propagate the exception
-        with self.assertRaises(Exception) as context:
-            rag_system.query("Test query")
-        
-        self.assertIn("API key invalid", str(context.exception))
-    
-    @patch('rag_system.DocumentProcessor')
-    @patch('rag_system.VectorStore')
-    @patch('rag_system.AIGenerator')
-    @patch('rag_system.SessionManager')
-    def test_tool_manager_failure(self, mock_session_mgr_class, mock_ai_gen_class,
-                                  mock_vector_store_class, mock_doc_proc_class):
-        """Test behavior when tool manager fails"""
-        # Set up mocks
-        mock_ai_generator = Mock()
-        mock_ai_gen_class.return_value = mock_ai_generator
-        mock_vector_store_class.return_value = Mock()
-        mock_session_mgr_class.return_value = Mock()
-        mock_doc_proc_class.return_value = Mock()
-        
-        rag_system = RAGSystem(self.mock_config)
-        
-        # Mock successful AI response but tool manager failure
-        mock_ai_generator.generate_response.return_value = "AI response"
-        
-        with patch.object(rag_system.tool_manager, 'get_last_sources') as mock_get_sources:
-            mock_get_sources.side_effect = Exception("Tool manager error")
-            
-            # Should propagate tool manager error
-            with self.assertRaises(Exception) as context:
-                rag_system.query("Test query")
-            
-            self.assertIn("Tool manager error", str(context.exception))
-
-
-if __name__ == '__main__':
+import copy
+import unittest
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import DEFAULT, Mock, call, patch
+
+# backend/ is on the import path via pythonpath in pyproject.toml.
+# rag_system is imported inside the fixtures and setUps that construct a
+# RAGSystem rather than here: it drags in chromadb (sqlite, onnx) and
+# anthropic transitively, and paying that at collection time would tax
+# runs that never select this module.
+#
+# Skip the module outright when those dependencies are absent.
+# find_spec only checks availability -- unlike pytest.importorskip it
+# does not execute the heavy imports during collection.
+from importlib.util import find_spec
+
+if find_spec("chromadb") is None or find_spec("anthropic") is None:
+    pytest.skip("requires chromadb and anthropic",
+                allow_module_level=True)
+
+
+def _make_config():
+    """Test config as a plain namespace; RAGSystem only reads attributes
+    off it, so Mock(spec=Config) introspection bought nothing"""
+    return SimpleNamespace(
+        CHUNK_SIZE=800,
+        CHUNK_OVERLAP=100,
+        CHROMA_PATH="./test_db",
+        EMBEDDING_MODEL="all-MiniLM-L6-v2",
+        MAX_RESULTS=5,
+        ANTHROPIC_API_KEY="test_key",
+        ANTHROPIC_MODEL="claude-sonnet-4-20250514",
+        MAX_HISTORY=2,
+    )
+
+
+# Prototypes built once at import. These mocks are passthrough stand-ins
+# injected into RAGSystem -- the tests only stub return values and read
+# call records, so spec= enforcement (a dir() walk over each real class)
+# bought nothing here. Copies share lazily-created child mocks with the
+# template, so _copy_proto wipes call history and configured values to
+# keep tests isolated.
+_CONFIG_PROTO = _make_config()
+_PROTO_MOCKS = {
+    name: Mock()
+    for name in ('vector_store', 'ai_generator', 'session_manager',
+                 'tool_manager', 'search_tool')
+}
+
+
+def _copy_proto(name):
+    """Fresh-looking mock from the prototype bundle"""
+    mock = copy.copy(_PROTO_MOCKS[name])
+    mock.reset_mock(return_value=True, side_effect=True)
+    return mock
+
+# Shared by every test that stubs get_tool_definitions; built once at import
+# and never mutated, so a tuple keeps it safely immutable
+MOCK_TOOL_DEFINITIONS = (
+    {"name": "search_course_content", "description": "Search content"},
+    {"name": "get_course_outline", "description": "Get outline"},
+)
+
+
+@pytest.fixture(scope="module")
+def rag_env():
+    """Patched RAGSystem plus its dependency mocks, built once per module.
+
+    query() only talks to the dependency mocks and never mutates the
+    system itself, so one construction serves every query test; the
+    function-scoped reset fixture below keeps tests isolated.
+    Construction-time assertions live in TestRAGSystemInitialization,
+    which still builds per test."""
+    with patch.multiple(
+        'rag_system', DocumentProcessor=DEFAULT, VectorStore=DEFAULT,
+        AIGenerator=DEFAULT, SessionManager=DEFAULT, ToolManager=DEFAULT,
+        CourseSearchTool=DEFAULT, CourseOutlineTool=DEFAULT,
+    ) as mock_classes:
+        from rag_system import RAGSystem
+
+        mocks = SimpleNamespace(
+            vector_store=mock_classes['VectorStore'].return_value,
+            ai_generator=mock_classes['AIGenerator'].return_value,
+            session_manager=mock_classes['SessionManager'].return_value,
+            tool_manager=mock_classes['ToolManager'].return_value,
+            search_tool=mock_classes['CourseSearchTool'].return_value,
+        )
+        rag_system = RAGSystem(copy.copy(_CONFIG_PROTO))
+        yield rag_system, mocks
+
+
+@pytest.fixture
+def rag_query_env(rag_env):
+    """The module RAGSystem with its dependency mocks reset for this test"""
+    rag_system, mocks = rag_env
+    for mock in vars(mocks).values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    return rag_system, mocks
+
+
+# (query, AI response, sources returned by the tool manager); every row
+# runs through the same wiring assertions. Sources are tuples since the
+# query path only passes them through, never mutates them.
+QUERY_CASES = [
+    ("What is MCP?", "This is the AI response",
+     ({"text": "Test Course - Lesson 1", "link": "http://example.com"},)),
+    ("How do I use MCP tools?", "Response", ()),
+    ("Source test", "Response",
+     ({"text": "Course A - Lesson 1", "link": "http://example.com/lesson1"},
+      {"text": "Course B - Lesson 2", "link": None},  # No link
+      "Simple string source")),  # Backward compatibility
+]
+
+
+@pytest.mark.parametrize("query,ai_response,mock_sources", QUERY_CASES,
+                         ids=["basic", "prompt-formatting", "sources-passthrough"])
+def test_query_variants(rag_query_env, query, ai_response, mock_sources):
+    """Test query wiring across basic, formatting, and sources cases"""
+    rag_system, mocks = rag_query_env
+    mocks.ai_generator.generate_response.return_value = ai_response
+    mocks.tool_manager.get_last_sources.return_value = mock_sources
+
+    response, sources = rag_system.query(query)
+
+    # Verify the AI generator was called correctly; count + call_args
+    # reads skip the _Call rebuild assert_called_once_with performs
+    assert mocks.ai_generator.generate_response.call_count == 1
+    call_args = mocks.ai_generator.generate_response.call_args[1]
+
+    # Check query was formatted with the instruction prefix
+    assert call_args['query'] == f"Answer this question about course materials: {query}"
+
+    # Check tools and tool manager were provided, and that no
+    # conversation history was passed for a session-less query
+    assert call_args['tool_manager'] is mocks.tool_manager
+    assert call_args['tools'] is not None
+    assert call_args['conversation_history'] is None
+
+    # Verify sources were retrieved, passed through unchanged, and reset
+    assert mocks.tool_manager.get_last_sources.call_count == 1
+    assert mocks.tool_manager.reset_sources.call_count == 1
+    assert response == ai_response
+    assert sources == mock_sources
+
+
+def test_query_with_session_id(rag_query_env):
+    """Test query processing with session management"""
+    rag_system, mocks = rag_query_env
+    session_id = "test_session_123"
+
+    # Mock session history
+    mock_history = "User: Previous question\nAssistant: Previous answer"
+    mocks.session_manager.get_conversation_history.return_value = mock_history
+
+    # Mock AI response
+    mocks.ai_generator.generate_response.return_value = "Response with context"
+    mocks.tool_manager.get_last_sources.return_value = []
+
+    # Execute query with session
+    response, sources = rag_system.query("Follow up question", session_id)
+
+    # Verify session history was retrieved
+    history_mock = mocks.session_manager.get_conversation_history
+    assert history_mock.call_count == 1
+    assert history_mock.call_args == call(session_id)
+
+    # Verify history was passed to AI generator
+    call_args = mocks.ai_generator.generate_response.call_args[1]
+    assert call_args['conversation_history'] == mock_history
+
+    # Verify session was updated with new exchange
+    add_exchange = mocks.session_manager.add_exchange
+    assert add_exchange.call_count == 1
+    assert add_exchange.call_args == call(
+        session_id, "Follow up question", "Response with context"
+    )
+
+
+def test_query_tool_manager_integration(rag_query_env):
+    """Test that tool manager is properly configured"""
+    rag_system, mocks = rag_query_env
+
+    # Mock AI response and sources
+    mocks.ai_generator.generate_response.return_value = "Tool-assisted response"
+    mocks.tool_manager.get_last_sources.return_value = []
+
+    mocks.tool_manager.get_tool_definitions.return_value = MOCK_TOOL_DEFINITIONS
+
+    # Execute query
+    rag_system.query("Test tool integration")
+
+    # Verify tool definitions were retrieved and passed
+    assert mocks.tool_manager.get_tool_definitions.call_count == 1
+    call_args = mocks.ai_generator.generate_response.call_args[1]
+    assert call_args['tools'] == MOCK_TOOL_DEFINITIONS
+
+
+def test_query_error_handling(rag_query_env):
+    """Test query error handling"""
+    rag_system, mocks = rag_query_env
+
+    # Mock AI generator to raise an exception
+    mocks.ai_generator.generate_response.side_effect = Exception("AI API error")
+
+    # Query should raise the exception (not handle it internally)
+    with pytest.raises(Exception, match="AI API error"):
+        rag_system.query("Error test")
+
+
+class TestRAGSystemInitialization(unittest.TestCase):
+    """Construction-time behavior; builds a fresh RAGSystem per test so
+    __init__ side effects stay observable"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._patchers = {
+            name: patch(f'rag_system.{name}')
+            for name in ('DocumentProcessor', 'VectorStore', 'AIGenerator',
+                         'SessionManager', 'ToolManager', 'CourseSearchTool',
+                         'CourseOutlineTool')
+        }
+        cls._mock_classes = {
+            name: patcher.start() for name, patcher in cls._patchers.items()
+        }
+        for patcher in cls._patchers.values():
+            cls.addClassCleanup(patcher.stop)
+
+    def setUp(self):
+        """Build a fresh RAGSystem so registration calls are per-test"""
+        from rag_system import RAGSystem
+
+        self.mock_tool_manager = _copy_proto('tool_manager')
+        self.mock_search_tool = _copy_proto('search_tool')
+        self._mock_classes['ToolManager'].return_value = self.mock_tool_manager
+        self._mock_classes['CourseSearchTool'].return_value = self.mock_search_tool
+        self.rag_system = RAGSystem(copy.copy(_CONFIG_PROTO))
+
+    def test_initialization_tool_registration(self):
+        """Test that tools are properly registered during initialization"""
+        # This tests the __init__ method behavior
+
+        # Verify tools were registered
+        self.mock_tool_manager.register_tool.assert_any_call(self.mock_search_tool)
+        self.assertEqual(self.mock_tool_manager.register_tool.call_count, 2)  # search + outline tools
+
+
+class TestRAGSystemIntegration(unittest.TestCase):
+    """Integration tests for RAG system components"""
+
+    @classmethod
+    def setUpClass(cls):
+        """One patch.multiple for the four rag_system dependencies; the
+        module target is resolved once instead of once per patcher"""
+        cls._patcher = patch.multiple(
+            'rag_system', DocumentProcessor=DEFAULT, VectorStore=DEFAULT,
+            AIGenerator=DEFAULT, SessionManager=DEFAULT,
+        )
+        cls._mock_classes = cls._patcher.start()
+        cls.addClassCleanup(cls._patcher.stop)
+
+    def setUp(self):
+        """Set up integration test fixtures"""
+        self.mock_config = copy.copy(_CONFIG_PROTO)
+
+    def test_end_to_end_query_flow(self):
+        """Test complete end-to-end query processing"""
+        from rag_system import RAGSystem
+
+        # Create real instances with mocked behavior
+        mock_vector_store = Mock()
+        mock_ai_generator = Mock()
+        mock_session_manager = Mock()
+
+        self._mock_classes['VectorStore'].return_value = mock_vector_store
+        self._mock_classes['AIGenerator'].return_value = mock_ai_generator
+        self._mock_classes['SessionManager'].return_value = mock_session_manager
+
+        # Create RAG system
+        rag_system = RAGSystem(self.mock_config)
+        
+        # Mock the complete flow
+        mock_session_manager.get_conversation_history.return_value = None
+        mock_ai_generator.generate_response.return_value = "MCP is Model Context Protocol"
+        
+        # Stub tool manager behavior by direct assignment; the RAG system
+        # is test-local, so there is nothing for a patch to restore
+        tool_manager = rag_system.tool_manager
+        tool_manager.get_tool_definitions = Mock(
+            return_value=[{"name": "search_course_content"}]
+        )
+        tool_manager.get_last_sources = Mock(
+            return_value=[{"text": "MCP Course", "link": None}]
+        )
+        tool_manager.reset_sources = Mock()
+
+        # Execute query
+        response, sources = rag_system.query("What is MCP?")
+
+        # Verify the complete flow
+        self.assertEqual(response, "MCP is Model Context Protocol")
+        self.assertEqual(sources, [{"text": "MCP Course", "link": None}])
+
+        # Verify all components were called
+        mock_ai_generator.generate_response.assert_called_once()
+        tool_manager.get_last_sources.assert_called_once()
+        tool_manager.reset_sources.assert_called_once()
+
+
+class TestRAGSystemFailureScenarios(unittest.TestCase):
+    """Test various failure scenarios in RAG system"""
+
+    @classmethod
+    def setUpClass(cls):
+        """One patch.multiple for the four rag_system dependencies; the
+        module target is resolved once instead of once per patcher"""
+        cls._patcher = patch.multiple(
+            'rag_system', DocumentProcessor=DEFAULT, VectorStore=DEFAULT,
+            AIGenerator=DEFAULT, SessionManager=DEFAULT,
+        )
+        cls._mock_classes = cls._patcher.start()
+        cls.addClassCleanup(cls._patcher.stop)
+
+    def setUp(self):
+        """Set up failure scenario test fixtures"""
+        self.mock_config = copy.copy(_CONFIG_PROTO)
+    
+    def test_component_failures(self):
+        """AI generator and tool manager failures both propagate from query()
+
+        One RAGSystem serves both cases; each subTest arranges the broken
+        component before driving the same query path."""
+        from rag_system import RAGSystem
+
+        mock_ai_generator = Mock()
+        self._mock_classes['AIGenerator'].return_value = mock_ai_generator
+        self._mock_classes['VectorStore'].return_value = Mock()
+        self._mock_classes['SessionManager'].return_value = Mock()
+        self._mock_classes['DocumentProcessor'].return_value = Mock()
+
+        rag_system = RAGSystem(self.mock_config)
+
+        def break_ai_generator():
+            mock_ai_generator.generate_response.side_effect = Exception(
+                "API key invalid")
+
+        def break_tool_manager():
+            mock_ai_generator.generate_response.side_effect = None
+            mock_ai_generator.generate_response.return_value = "AI response"
+            rag_system.tool_manager.get_last_sources = Mock(
+                side_effect=Exception("Tool manager error"))
+
+        cases = [
+            ("ai generator", break_ai_generator, "API key invalid"),
+            ("tool manager", break_tool_manager, "Tool manager error"),
+        ]
+        for name, arrange, message in cases:
+            with self.subTest(component=name):
+                arrange()
+                with self.assertRaisesRegex(Exception, message):
+                    rag_system.query("Test query")
+
+
+if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file